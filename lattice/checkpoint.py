@@ -0,0 +1,155 @@
+'''
+Checkpoints of running simulations.
+
+A checkpoint holds the dynamic state of a system (see System.snapshot),
+that is each inflow node's position, each reservoir's storage, and the logs attached to its nodes,
+so a long simulation can be resumed (in another process) from the last checkpoint
+rather than from its first timestep (see System.simulation, which saves checkpoints as it runs).
+Records already written to sinks are not stored, sinks resume writing after them (see Sink.resume).
+
+Checkpoints are uncompressed .npz files: node states and log records are stored as binary arrays,
+other log fields (headers, cursors, options) as a small json document.
+Input data is not stored, the resumed system must be built from the same data.
+'''
+import os
+import json
+import dataclasses
+from typing import Any, TYPE_CHECKING
+
+import numpy as np
+
+from lattice.node import Log, SummaryLog
+from lattice.results import as_tuple
+from lattice.sinks import Sink
+
+if TYPE_CHECKING:
+    from lattice.system import System
+
+# log fields stored as binary arrays (rather than in the json document), or not stored.
+_ARRAY_FIELDS = ('data', 'pending')
+_SKIPPED_FIELDS = ('sink',)
+# summary log fields (stored in the json document) that hold arrays.
+_SUMMARY_ARRAYS = ('mean', 'm2', 'minimum', 'maximum')
+_LOG_TYPES = {'Log': Log, 'SummaryLog': SummaryLog}
+
+def save_checkpoint(path: str, system: 'System', logs: None|dict[str, Log] = None,
+                    steps: int = 0) -> None:
+    '''
+    Saves the dynamic state of the system, and its logs, to a checkpoint file.
+
+    The file is written next to path and then moved into place,
+    so a run stopped while saving leaves the previous checkpoint intact.
+
+    Args:
+        path(str): path to the checkpoint file.
+        system(System): system to save.
+        logs(None|dict[str, Log]): node names (keys) and logs attached to the nodes (values),
+            None by default (if None, logs are not saved).
+            Only records held in memory are saved, sinks are not (see load_checkpoint).
+        steps(int): number of timesteps run since the simulation started, 0 by default
+            (see checkpoint_steps).
+
+    Raises:
+        ValueError: if a node state holds values that are not numbers.
+    '''
+    values, integers, offsets = [], [], [0]
+    for node in system.plan.nodes:
+        state = node.snapshot()
+        if not all(isinstance(value, (int, float, np.number)) for value in state):
+            raise ValueError(
+                f'{node.name} node state {state} cannot be saved, only numbers are supported.')
+        values.extend(float(value) for value in state)
+        integers.extend(isinstance(value, (int, np.integer)) for value in state)
+        offsets.append(len(values))
+    arrays = {'names': np.array([node.name for node in system.plan.nodes]),
+              'state': np.array(values, dtype=float),
+              'integers': np.array(integers, dtype=bool),
+              'offsets': np.array(offsets, dtype=np.int64),
+              'steps': np.array(steps, dtype=np.int64)}
+    documents = {}
+    for i, (name, log) in enumerate((logs or {}).items()):
+        fields = {}
+        for item in dataclasses.fields(log):
+            value = getattr(log, item.name)
+            if item.name in _ARRAY_FIELDS:
+                if item.name == 'data':
+                    value = log.to_array()
+                if value is not None:
+                    arrays[f'{item.name}_{i}'] = value
+            elif item.name not in _SKIPPED_FIELDS:
+                fields[item.name] = value
+        documents[name] = {'type': type(log).__name__, 'fields': fields}
+    arrays['logs'] = np.array(json.dumps(documents, default=_as_list))
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(temporary, path)
+
+def load_checkpoint(path: str, system: 'System',
+                    sinks: None|dict[str, Sink] = None) -> dict[str, Log]:
+    '''
+    Restores the dynamic state of the system, and its logs, from a checkpoint file.
+
+    Saved logs are attached to their nodes (replacing any attached logs).
+    Logs that had sinks are restored without them,
+    records already flushed are counted by Log.flushed, unless a sink is passed for the log:
+    it resumes writing after the flushed records (see Sink.resume).
+
+    Args:
+        path(str): path to the checkpoint file.
+        system(System): system built with the same diagram and input data as the saved system.
+        sinks(None|dict[str, Sink]): node names (keys) and sinks (values) writing to the files
+            the saved logs' sinks wrote to, None by default.
+
+    Returns:
+        dict[str, Log]: node names (keys) and restored logs (values).
+    Raises:
+        ValueError: if the system nodes are not the saved system nodes,
+            or a sink's file holds fewer records than its log flushed.
+    '''
+    arrays = _read_arrays(path)
+    names = tuple(str(name) for name in arrays['names'].tolist())
+    if names != tuple(node.name for node in system.plan.nodes):
+        raise ValueError(f'''
+            Checkpoint nodes {names} do not match
+            system nodes {tuple(node.name for node in system.plan.nodes)}.''')
+    values = [int(value) if integer else float(value)
+              for value, integer in zip(arrays['state'].tolist(), arrays['integers'].tolist())]
+    offsets = arrays['offsets'].tolist()
+    system.restore(tuple(tuple(values[offsets[i]:offsets[i + 1]]) for i in range(len(names))))
+    logs = {}
+    for i, (name, document) in enumerate(json.loads(str(arrays['logs'])).items()):
+        fields = document['fields']
+        fields['headers'] = as_tuple(fields['headers'])
+        if document['type'] == 'SummaryLog':
+            fields.update((key, np.asarray(fields[key], dtype=float)) for key in _SUMMARY_ARRAYS)
+            fields['below'] = {key: np.asarray(value) for key, value in fields['below'].items()}
+        for key in _ARRAY_FIELDS:
+            if f'{key}_{i}' in arrays:
+                fields[key] = arrays[f'{key}_{i}']
+        log = system.node_by_name(name).attach_log(_LOG_TYPES[document['type']]())
+        # attaching may write the current state to the log, the saved fields replace it.
+        for key, value in fields.items():
+            setattr(log, key, value)
+        if sinks is not None and name in sinks:
+            log.sink = sinks[name]
+            log.sink.resume(log.flushed)
+        logs[name] = log
+    return logs
+
+def checkpoint_steps(path: str) -> int:
+    '''Return number of timesteps run (since the simulation started) when the file was saved.'''
+    return int(_read_arrays(path)['steps'])
+
+def _read_arrays(path: str) -> dict[str, np.ndarray]:
+    '''Return arrays stored in a checkpoint file (names as keys), and closes the file.'''
+    with np.load(path, allow_pickle=False) as checkpoint:
+        return {key: checkpoint[key] for key in checkpoint.files}
+
+def _as_list(value: Any) -> Any:
+    '''Converts numpy values to json serializable values.'''
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} values cannot be saved in checkpoints.')
@@ -0,0 +1,363 @@
+'''
+Simulation engines.
+
+Engines advance a compiled system plan (see lattice.plan) through time.
+
+- The plan engine runs one node at a time, and supports any node operations.
+- The layer engine treats each diagram layer as a wavefront:
+all storage nodes in a layer are operated with a single vectorized call per timestep,
+and their outflows are scattered to the downstream layer.
+It supports passive storage nodes only (see lattice.reservoir.passive_operation),
+and ensembles of inflows (all members are run together).
+- The series engine runs one node at a time for the whole simulation:
+since system diagrams are trees (without feedback), a node's outflow series
+depends only on its senders outflow series.
+Passive nodes are run with whole series kernels, all other nodes are run timestep by timestep.
+
+All engines fill the same logs, so they can be swapped without changing outputs.
+'''
+import inspect
+from enum import Enum
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from lattice.node import Node, Log, Tag, Inflow, Storage, Outlet, transfer_flow
+from lattice.plan import Plan, run_plan
+from lattice.reservoir import (BasicReservoir, passive_operation,
+                               passive_operation_array, passive_operation_series)
+
+class Engine(str, Enum):
+    '''
+    Simulation engines used to run a system.
+    '''
+    PLAN = 'plan'
+    '''Run nodes one at a time in plan order, supports any node operations.'''
+    LAYER = 'layer'
+    '''Run all storage nodes in a layer with one vectorized call, supports passive storage only.'''
+    SERIES = 'series'
+    '''Run each node for all timesteps before its receiver, supports any node operations.'''
+
+def run(plan: Plan, time_steps: int, logs: dict[str, Log], engine: Engine = Engine.PLAN) -> None:
+    '''
+    Runs the plan with the selected engine, modifies nodes and logs in place.
+
+    Args:
+        plan(Plan): compiled system plan.
+        time_steps(int): number of time steps to run the simulation.
+        logs(dict[str, Log]): node names (keys) and logs attached to the nodes (values),
+            logs of nodes with logging disabled (see enable_log) are not filled.
+        engine(Engine): engine used to run the simulation.
+
+    Raises:
+        ValueError: if inflow nodes hold ensembles and the engine is not the layer engine.
+    '''
+    engine = Engine(engine)
+    if engine != Engine.LAYER and ensemble_members(plan) is not None:
+        raise ValueError(
+            f'''
+            Ensemble inflows can only be simulated with the layer engine.
+            The {engine.value} engine was selected.
+            '''
+        )
+    disabled = {node.name for node in plan.nodes if node.log is not None and not node.logging}
+    logs = {name: log for name, log in logs.items() if name not in disabled}
+    match engine:
+        case Engine.PLAN:
+            run_plan(plan, time_steps)
+        case Engine.LAYER:
+            run_layers(plan, time_steps, logs)
+        case Engine.SERIES:
+            run_series(plan, time_steps, logs)
+
+def is_passive(node: Node) -> bool:
+    '''Return True if node operations can be vectorized by the layer engine.'''
+    match node.tag:
+        case Tag.INFLOW:
+            return isinstance(node, Inflow) and inspect.unwrap(node.operations) is transfer_flow
+        case Tag.STORAGE:
+            return (isinstance(node, Storage)
+                    and isinstance(node.reservoir, BasicReservoir)
+                    and node.reservoir.operations is passive_operation)
+        case Tag.OUTLET:
+            return isinstance(node, Outlet)
+    return False
+
+def ensemble_members(plan: Plan) -> None|int:
+    '''
+    Return number of ensemble members in the plan's inflow data.
+
+    Returns:
+        None|int: None if no inflow node holds ensemble (2-D) data.
+    Raises:
+        ValueError: if inflow nodes hold ensembles with different numbers of members.
+    '''
+    members = {node.members for node in plan.nodes if node.tag == Tag.INFLOW and node.is_ensemble}
+    if len(members) > 1:
+        raise ValueError(
+            f'''
+            All ensemble inflow nodes must have the same number of members.
+            {sorted(members)} members found.
+            '''
+        )
+    return members.pop() if members else None
+
+def run_layers(plan: Plan, time_steps: int, logs: dict[str, Log]) -> None:
+    '''
+    Runs the plan one layer at a time, with vectorized storage operations.
+
+    Node operations are not called (so attached loggers are bypassed),
+    logs are filled directly from the layer arrays.
+    Timesteps are run in blocks of the smallest log chunk (see Log.chunk): only one block
+    of inflows and records is held in memory, and logs (and sinks) receive one block at a time.
+
+    Ensembles: if any inflow node holds (members x timesteps) data,
+    every node carries one state per member, and all members advance together.
+    Inflow nodes with 1-D data send the same inflows to every member.
+    Logs hold (records, members, fields) arrays.
+
+    Raises:
+        ValueError: if the plan contains nodes that are not passive (see is_passive).
+    '''
+    for node in plan.nodes:
+        if not is_passive(node):
+            raise ValueError(
+                f'''
+                The layer engine only supports passive inflow, storage and outlet nodes.
+                The {node.name} {node.tag.value} node is not passive.
+                '''
+            )
+    ensemble = ensemble_members(plan)
+    index = LayerIndex.from_plan(plan, logs)
+    layers = layer_table(plan, index.slot)
+    state = LayerState.from_nodes([plan.nodes[i] for i in index.storages], ensemble or 1)
+    block = min((log.chunk for log in logs.values()), default=Log.chunk)
+    for start in range(0, time_steps, block):
+        series = inflow_series(plan, index.inflows, min(block, time_steps - start), ensemble or 1)
+        outlet, records = run_layer_steps(layers, series, state,
+                                          [index.slot[i] for i in index.logged])
+        columns = index.columns(series, outlet, records)
+        for i, node in enumerate(plan.nodes):
+            if node.name in logs:
+                logs[node.name].extend(stack_columns(ensemble, *columns[i]))
+    state.to_nodes([plan.nodes[i] for i in index.storages], ensemble)
+
+@dataclass
+class LayerIndex:
+    '''
+    Positions (in the plan) of the nodes run by the layer engine,
+    and their positions in the layer engine's inflow or storage arrays.
+    '''
+    inflows: list[int]
+    '''Positions of inflow nodes.'''
+    storages: list[int]
+    '''Positions of storage nodes.'''
+    logged: list[int]
+    '''Positions of logged storage nodes.'''
+    slot: dict[int, int]
+    '''Inflow and storage node positions (keys) and positions in the engine arrays (values).'''
+
+    @classmethod
+    def from_plan(cls, plan: Plan, logs: dict[str, Log]) -> 'LayerIndex':
+        '''Return positions of the plan's inflow, storage and logged storage nodes.'''
+        inflows = [i for i, node in enumerate(plan.nodes) if node.tag == Tag.INFLOW]
+        storages = [i for i, node in enumerate(plan.nodes) if node.tag == Tag.STORAGE]
+        return cls(inflows, storages, [i for i in storages if plan.nodes[i].name in logs],
+                   {i: k for k, i in enumerate(inflows)} | {i: k for k, i in enumerate(storages)})
+
+    def columns(self, series: np.ndarray, outlet: np.ndarray,
+                records: np.ndarray) -> dict[int, tuple[np.ndarray,...]]:
+        '''
+        Return node positions (keys) and (timesteps, members) log columns (values)
+        of inflow, logged storage and outlet nodes, from a block of run_layer_steps results.
+        '''
+        return ({i: (series[self.slot[i]],) for i in self.inflows}
+                | {i: tuple(records[:, :, k]) for k, i in enumerate(self.logged)} | {0: (outlet,)})
+
+@dataclass
+class LayerState:
+    '''
+    Storage node arrays advanced by the layer engine, (storage nodes, members) arrays
+    (capacity is a (storage nodes, 1) array).
+    '''
+    volume: np.ndarray
+    '''Stored volumes.'''
+    capacity: np.ndarray
+    '''Reservoir capacities.'''
+    inflow: np.ndarray
+    '''Inflows in the last timestep.'''
+    release: np.ndarray
+    '''Releases in the last timestep.'''
+
+    @classmethod
+    def from_nodes(cls, storages: list[Storage], members: int) -> 'LayerState':
+        '''Return state of storage nodes, with members copies of each node's state.'''
+        volume = np.zeros((len(storages), members))
+        for k, node in enumerate(storages):
+            volume[k] = node.reservoir.storage
+        capacity = np.array([node.reservoir.capacity for node in storages], dtype=float)
+        return cls(volume, capacity.reshape(-1, 1), np.zeros_like(volume), np.zeros_like(volume))
+
+    def to_nodes(self, storages: list[Storage], ensemble: None|int) -> None:
+        '''Sets stored volumes of storage nodes, (members,) arrays for ensembles.'''
+        for k, node in enumerate(storages):
+            node.reservoir.storage = self.volume[k].copy() if ensemble else float(self.volume[k, 0])
+
+def inflow_series(plan: Plan, inflows: list[int], time_steps: int, members: int) -> np.ndarray:
+    '''Return (inflow nodes, timesteps, members) inflows of inflow nodes at positions inflows.'''
+    series = np.zeros((len(inflows), time_steps, members))
+    for k, i in enumerate(inflows):
+        taken = plan.nodes[i].take(time_steps)
+        series[k] = taken.T if taken.ndim == 2 else taken[:, np.newaxis]
+    return series
+
+def run_layer_steps(layers: list[tuple[Any,...]], series: np.ndarray, state: LayerState,
+                    logged: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Runs the layers (see layer_table) for each timestep of the series, modifies state in place.
+
+    Args:
+        layers(list[tuple[Any,...]]): layers in execution order, as returned by layer_table.
+        series(np.ndarray): (inflow nodes, timesteps, members) inflows.
+        state(LayerState): storage node arrays.
+        logged(list[int]): positions of logged storage nodes in the storage arrays.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (timesteps, members) outlet outflows,
+            and (3, timesteps, logged storage nodes, members) inflow, volume and release records.
+    '''
+    _, time_steps, members = series.shape
+    outlet = np.zeros((time_steps, members))
+    records = np.zeros((3, time_steps, len(logged), members))
+    for t in range(time_steps):
+        outlet[t] = run_layer_step(layers, series[:, t], state)
+        records[:, t] = state.inflow[logged], state.volume[logged], state.release[logged]
+    return outlet, records
+
+def run_layer_step(layers: list[tuple[Any,...]], inflows: np.ndarray,
+                   state: LayerState) -> np.ndarray:
+    '''
+    Runs one timestep of the layers (see layer_table), modifies state in place.
+
+    Args:
+        layers(list[tuple[Any,...]]): layers in execution order, as returned by layer_table.
+        inflows(np.ndarray): (inflow nodes, members) inflows for the timestep.
+        state(LayerState): storage node arrays.
+
+    Returns:
+        np.ndarray: (members,) outlet outflows.
+    '''
+    m = inflows.shape[-1]
+    received = np.zeros((layers[0][0], m))
+    for size, inflow_local, inflow_slots, local, storage, receivers, downstream in layers:
+        outflows = np.zeros((size, m))
+        outflows[inflow_local] = inflows[inflow_slots]
+        state.inflow[storage] = received[local]
+        state.release[storage] = passive_operation_array(
+            state.volume[storage], state.capacity[storage], state.inflow[storage])
+        outflows[local] = state.release[storage]
+        if receivers is None:
+            return received[0]
+        received = np.zeros((downstream, m))
+        np.add.at(received, receivers, outflows)
+    return received[0]
+
+def layer_table(plan: Plan, slot: dict[int, int]) -> list[tuple[Any,...]]:
+    '''
+    Return the layers of the plan in execution order (upstream most layer first), for run_layers.
+
+    Nodes are numbered layer by layer,
+    so each layer's inflow and storage nodes are contiguous slices of the inflow and storage arrays.
+
+    Args:
+        plan(Plan): compiled system plan.
+        slot(dict[int, int]): inflow and storage node positions (keys) and their positions
+            in the inflow or storage arrays (values).
+
+    Returns:
+        list[tuple[Any,...]]: for each layer (layer size, inflow positions in layer,
+            inflow array slice, storage positions in layer, storage array slice,
+            receiver positions in the downstream layer (None for the outlet layer),
+            downstream layer size).
+    '''
+    tags = [node.tag for node in plan.nodes]
+    layers = []
+    for k in range(len(plan.layers) - 2, -1, -1):
+        start, stop = plan.layers[k], plan.layers[k + 1]
+        layer_inflows = [i for i in range(start, stop) if tags[i] == Tag.INFLOW]
+        layer_storages = [i for i in range(start, stop) if tags[i] == Tag.STORAGE]
+        receivers = None
+        if k:
+            receivers = np.array([plan.receivers[i] - plan.layers[k - 1]
+                                  for i in range(start, stop)], dtype=int)
+        layers.append((
+            stop - start,
+            np.array([i - start for i in layer_inflows], dtype=int),
+            slots(slot, layer_inflows),
+            np.array([i - start for i in layer_storages], dtype=int),
+            slots(slot, layer_storages),
+            receivers,
+            plan.layers[k] - plan.layers[k - 1] if k else 0,
+        ))
+    return layers
+
+def slots(slot: dict[int, int], positions: list[int]) -> slice:
+    '''Return slice of the inflow or storage arrays holding nodes at (contiguous) positions.'''
+    return slice(slot[positions[0]], slot[positions[-1]] + 1) if positions else slice(0, 0)
+
+def stack_columns(ensemble: None|int, *columns: np.ndarray) -> np.ndarray:
+    '''
+    Stacks (timesteps, members) columns into a (timesteps, fields) array,
+    or a (timesteps, members, fields) array for ensembles.
+    '''
+    array = np.stack(columns, axis=-1)
+    return array if ensemble else array[:, 0]
+
+def run_series(plan: Plan, time_steps: int, logs: dict[str, Log]) -> None:
+    '''
+    Runs the plan one node at a time, computing each node's full outflow series.
+
+    Only the outflow series of nodes whose receivers have not been run yet are held in memory.
+    Passive nodes (see is_passive) bypass attached loggers, their logs are filled directly.
+    All other nodes are run timestep by timestep (through their attached loggers).
+    '''
+    flows: list[None|np.ndarray] = [None] * len(plan.nodes)
+    for i in plan.order:
+        node = plan.nodes[i]
+        senders = plan.senders_of(i)
+        if not senders:
+            flows[i] = send_series(node, time_steps, logs.get(node.name))
+            continue
+        # same order of additions as the plan engine.
+        inflows = flows[senders[0]]
+        for j in senders[1:]:
+            inflows = inflows + flows[j]
+        for j in senders:
+            flows[j] = None
+        flows[i] = release_series(node, inflows, logs.get(node.name))
+
+def send_series(node: Node, time_steps: int, log: None|Log) -> np.ndarray:
+    '''Return outflow series of a node without senders, passive nodes fill log directly.'''
+    if not is_passive(node):
+        return np.array([node.send() for _ in range(time_steps)], dtype=float)
+    outflows = node.take(time_steps)
+    if log is not None:
+        log.extend(outflows[:, np.newaxis])
+    return outflows
+
+def release_series(node: Node, inflows: np.ndarray, log: None|Log) -> np.ndarray:
+    '''Return outflow series of a node given its inflow series, passive nodes fill log directly.'''
+    if not is_passive(node):
+        return np.array([node.release(q) for q in inflows.tolist()], dtype=float)
+    if node.tag == Tag.STORAGE:
+        storages, outflows = passive_operation_series(
+            node.reservoir.storage, node.reservoir.capacity, inflows)
+        if len(storages):
+            node.reservoir.storage = float(storages[-1])
+        if log is not None:
+            log.extend(np.column_stack((inflows, storages, outflows)))
+        return outflows
+    if log is not None:
+        log.extend(inflows[:, np.newaxis])
+    return inflows
@@ -11,13 +11,19 @@ Nodes "subscribe" to upstream node(s) and upstream nodes "publish" outflows.
 All nodes are publishers (send flows downstream) intermediate and outlet nodes 
 are also subscribers (receive flows from other nodes). 
 '''
+import os
+import mmap
 from enum import Enum
+from collections import Counter
 from dataclasses import dataclass, field
 from typing import Protocol, Self, Callable, Any, runtime_checkable
 
+import numpy as np
 import pandas as pd
 
 from lattice.reservoir import Reservoir, BasicReservoir
+from lattice.sinks import Sink
+from lattice.sources import TextSource, read_table
 
 class Tag(str, Enum):
     '''
@@ -41,34 +47,482 @@ class Tag(str, Enum):
 
 #TODO: add implementation for DIVERSION, TRANSFER, and PERFORMANCE nodes.
 
-@dataclass
+@dataclass(eq=False)
 class Log:
     '''
     Stores node data for log entries.
+
+    Records are stored in a preallocated (records, fields) array,
+    with one column per (flattened) header,
+    or a (records, members, fields) array for ensemble simulations.
+
+    Logs with a sink (see lattice.sinks) hold at most chunk records in memory,
+    full chunks are flushed to the sink as the simulation runs.
+
+    Logs can be decimated: only records (numbered from 0 in the order they are written)
+    in the start to stop window, and every stride-th record in the window are kept.
+    Kept records can be aggregated over each period of records (see aggregations).
+    Storage logs start with the initial state (see append_initial), so their record i + 1
+    is the state after timestep i, the initial state is kept and not numbered.
     '''
-    records: list[Any] = field(default_factory=list)
-    '''Simulation data.'''
     headers: tuple[str] = field(default_factory=tuple)
-    # '''Log output headers.'''
-    # is_active: bool = False
+    '''Log output headers.'''
+    data: np.ndarray = field(default_factory=lambda: np.zeros((0, 0)), repr=False)
+    '''Simulation data, only the first size records have been written.'''
+    size: int = 0
+    '''Number of records written (and not yet flushed to the sink).'''
+    sink: None|Sink = None
+    '''Destination for records, None by default (if None, all records are held in memory).'''
+    chunk: int = 4096
+    '''Number of records held in memory before they are flushed to the sink.'''
+    flushed: int = 0
+    '''Number of records flushed to the sink.'''
+    start: int = 0
+    '''First record to keep.'''
+    stop: None|int = None
+    '''Record to stop keeping at, None by default (if None, records are kept to the end).'''
+    stride: int = 1
+    '''Keep every stride-th record in the window.'''
+    period: int = 1
+    '''Number of kept records aggregated into each logged record.'''
+    aggregations: dict[str, str] = field(default_factory=dict)
+    '''
+    Column names (keys) and aggregation over each period (values):
+    'sum', 'mean', 'min', 'max' or 'last'.
+    By default averaged (storage) columns are averaged and all other (flow) columns are summed.
+    '''
+    averaged: tuple[int,...] = ()
+    '''Positions of columns averaged by default (see aggregations), storage logs average storage.'''
+    step: int = 0
+    '''Number of records passed to the log (including records that were not kept).'''
+    pending: None|np.ndarray = field(default=None, repr=False)
+    '''Kept records waiting for the rest of their aggregation period.'''
+
+    def __post_init__(self) -> None:
+        # flattened headers, computed once for each headers tuple (see columns).
+        self.__headers: Any = None
+        self.__columns: tuple[str,...] = ()
+        # data that records are written to without checks (None if append needs checks),
+        # through 1-D views of its columns nested like the headers (see __prepare).
+        self.__rows: None|np.ndarray = None
+        self.__targets: tuple[Any,...] = ()
+        self.__scalar = False
+
+    def __getstate__(self) -> dict[str, Any]:
+        '''Return log state for pickling, without the column views used by append.'''
+        state = self.__dict__.copy()
+        state['_Log__rows'] = None
+        state['_Log__targets'] = ()
+        return state
 
     def logger(self, function: Callable[..., Any]) -> Callable[..., float]:
         '''
         Decorator to log node level simulation outputs and send node outflows.
         '''
-        def wrapper(*args, **kwargs) -> float:
-            output = function(*args, **kwargs)
-            self.records.append(output)
-            return output
-        return wrapper
+        return LoggedOperation(function, self)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def fields(self) -> int:
+        '''Return number of values in each record.'''
+        return len(self.columns)
+
+    @property
+    def columns(self) -> tuple[str,...]:
+        '''Return one name per record value (flattened headers, see flatten_headers).'''
+        if self.__headers is not self.headers:
+            self.__headers = self.headers
+            self.__columns = flatten_headers(self.headers)
+        return self.__columns
+
+    @property
+    def members(self) -> None|int:
+        '''Return number of ensemble members (None if the log is not from an ensemble).'''
+        return self.data.shape[1] if self.data.ndim == 3 else None
+
+    @property
+    def decimated(self) -> bool:
+        '''Return True if some records are not kept, or kept records are aggregated.'''
+        return self.start > 0 or self.stop is not None or self.stride > 1 or self.period > 1
+
+    def reserve(self, rows: int, members: None|int = None) -> None:
+        '''
+        Preallocates space for rows more records (so writing them does not allocate memory).
+
+        Args:
+            rows(int): number of records to add space for.
+            members(None|int): number of ensemble members, None by default.
+                If None, the log keeps its current number of members.
+        '''
+        members = members or self.members
+        fields = self.fields
+        if self.decimated:
+            window = (rows if self.stop is None else min(rows, max(self.stop - self.step, 0)))
+            rows = -(-window // (self.stride * self.period)) + 1
+        if self.sink is not None:
+            # memory is bounded by the chunk size.
+            rows = max(self.chunk - self.size, 0)
+        if (members == self.members and self.data.shape[-1] == fields
+            and self.size + rows <= len(self.data)):
+            return
+        if members:
+            data = np.zeros((self.size + rows, members, fields))
+        else:
+            # column major, so each column is a contiguous series.
+            data = np.zeros((self.size + rows, fields), order='F')
+        if self.size:
+            # records written before an ensemble simulation are the same for every member.
+            data[:self.size] = (self.data[:self.size, np.newaxis]
+                                if members and not self.members else self.data[:self.size])
+        self.data = data
+
+    def append(self, record: Any) -> None:
+        '''Writes record (nested like the headers) to the log.'''
+        size = self.size
+        if self.data is self.__rows and size < len(self.__rows):
+            # writing scalars to column views is much faster than writing rows.
+            if self.__scalar:
+                self.__targets[0][size] = record
+            else:
+                for target, value in zip(self.__targets, record):
+                    if target.__class__ is tuple:
+                        for column, item in zip(target, value):
+                            column[size] = item
+                    else:
+                        target[size] = value
+            self.size = size + 1
+            return
+        self.__append(record)
+        self.__prepare()
+
+    def append_initial(self, record: Any) -> None:
+        '''
+        Writes the initial state record (nested like the headers) to the log.
+
+        The record is always kept as is: it is not counted in step,
+        so decimation windows and periods only apply to the records after it.
+        '''
+        if not self.decimated:
+            self.append(record)
+            return
+        self.__write(np.stack(np.broadcast_arrays(*flatten_record(record)), axis=-1)[np.newaxis])
+
+    def __append(self, record: Any) -> None:
+        if self.decimated:
+            self.extend(np.stack(np.broadcast_arrays(*flatten_record(record)), axis=-1)[np.newaxis])
+            return
+        if self.size and self.size == len(self.data) and self.sink is not None:
+            self.flush()
+        if self.size == len(self.data) or self.data.shape[-1] != self.fields:
+            self.reserve(max(self.size, 1))
+        values = flatten_record(record)
+        if self.members:
+            self.data[self.size] = np.stack(np.broadcast_arrays(*values), axis=-1)
+        else:
+            self.data[self.size] = values
+        self.size += 1
+
+    def __prepare(self) -> None:
+        # allow append to skip checks if records are not decimated, not from ensembles,
+        # have one value per column of data, and are nested at most one level deep.
+        fast = (not self.decimated and self.data.ndim == 2 and self.data.shape[1] == self.fields
+                and all(isinstance(header, str) or all(isinstance(item, str) for item in header)
+                        for header in self.headers))
+        self.__rows = self.data if fast else None
+        if not fast:
+            return
+        columns = iter(self.data.T)
+        self.__targets = tuple(tuple(next(columns) for _ in header) if isinstance(header, tuple)
+                               else next(columns) for header in self.headers)
+        # records of logs with a single (not nested) header are scalars, not tuples.
+        self.__scalar = len(self.headers) == 1 and isinstance(self.headers[0], str)
+
+    def extend(self, values: np.ndarray) -> None:
+        '''
+        Writes a block of records to the log.
+
+        Args:
+            values(np.ndarray): (records, fields) array,
+                or (records, members, fields) array for ensembles.
+        '''
+        if self.decimated:
+            values = self.__decimate(values)
+        self.__write(values)
+
+    def __write(self, values: np.ndarray) -> None:
+        if len(values) == 0:
+            return
+        if self.sink is not None:
+            self.flush()
+            self.sink.write(values, self.columns)
+            self.flushed += len(values)
+            return
+        self.reserve(len(values), values.shape[1] if values.ndim == 3 else None)
+        self.data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def __decimate(self, values: np.ndarray) -> np.ndarray:
+        # keep records in the window and stride.
+        index = np.arange(self.step, self.step + len(values))
+        self.step += len(values)
+        keep = (index >= self.start) & ((index - self.start) % self.stride == 0)
+        if self.stop is not None:
+            keep &= index < self.stop
+        values = np.asarray(values, dtype=float)[keep]
+        if self.period == 1:
+            return values
+        # aggregate complete periods, hold the rest until the next records.
+        if self.pending is not None:
+            values = np.concatenate((self.pending, values))
+        periods = len(values) // self.period
+        self.pending = values[periods * self.period:].copy()
+        return self.__aggregate(values[:periods * self.period].reshape(
+            (periods, self.period) + values.shape[1:]))
+
+    def __aggregate(self, groups: np.ndarray) -> np.ndarray:
+        # (periods, period, [members,] fields) -> (periods, [members,] fields).
+        values = np.zeros(groups.shape[:1] + groups.shape[2:])
+        for j, column in enumerate(self.columns):
+            match self.aggregations.get(column, 'mean' if j in self.averaged else 'sum'):
+                case 'sum':
+                    values[..., j] = groups[..., j].sum(axis=1)
+                case 'mean':
+                    values[..., j] = groups[..., j].mean(axis=1)
+                case 'min':
+                    values[..., j] = groups[..., j].min(axis=1)
+                case 'max':
+                    values[..., j] = groups[..., j].max(axis=1)
+                case 'last':
+                    values[..., j] = groups[:, -1, ..., j]
+                case aggregation:
+                    raise ValueError(f'Unknown aggregation {aggregation} for column {column}.')
+        return values
+
+    def flush(self) -> None:
+        '''Writes records held in memory to the sink.'''
+        if self.sink is not None and self.size:
+            self.sink.write(self.to_array(), self.columns)
+            self.flushed += self.size
+            self.size = 0
+
+    def close(self) -> None:
+        '''
+        Logs the aggregate of any incomplete period,
+        and flushes records held in memory and closes the sink.
+        '''
+        if self.pending is not None and len(self.pending):
+            self.__write(self.__aggregate(self.pending[np.newaxis]))
+            self.pending = None
+        if self.sink is not None:
+            self.flush()
+            self.sink.close()
+
+    @property
+    def records(self) -> list[Any]:
+        '''
+        Return simulation data as a list of records nested like the headers,
+        for example: (inflow, storage, (outflow,)) for storage nodes, or outflow for outlet nodes.
+        Ensemble records hold an array of member values in place of each value.
+        '''
+        if self.members:
+            return [nest_record(list(row.T), self.headers) for row in self.to_array()]
+        return [nest_record(row, self.headers) for row in self.to_array().tolist()]
 
     # def reset(self):
     #     '''Resets log records.'''
     #     self.records = []
 
     def to_dataframe(self) -> pd.DataFrame:
-        '''Return log data as a pandas DataFrame.'''
-        return pd.DataFrame(self.records, columns=self.headers)
+        '''
+        Return log data as a pandas DataFrame, with one float column per record value (see columns).
+
+        The DataFrame wraps the log data without copying it,
+        except for ensemble logs, which are indexed by record and member.
+        '''
+        columns = list(self.columns)
+        if self.members:
+            index = pd.MultiIndex.from_product([range(self.size), range(self.members)],
+                                               names=['record', 'member'])
+            return pd.DataFrame(self.to_array().reshape(-1, self.fields),
+                                index=index, columns=columns)
+        return pd.DataFrame(self.to_array(), columns=columns, copy=False)
+
+    def to_array(self) -> np.ndarray:
+        '''
+        Return log data as an array, with nested record values flattened into fields.
+
+        Returns:
+            np.ndarray: (records, fields) array,
+                or (records, members, fields) array for ensemble simulations.
+        '''
+        return self.data[:self.size]
+
+@dataclass(eq=False)
+class SummaryLog(Log):
+    '''
+    Log that only keeps summary statistics of each record value (O(1) memory).
+
+    Count, mean, variance (population), minimum and maximum are updated online
+    (Welford's algorithm, or Chan's for blocks of records), as are the number of records
+    with values below the thresholds. Records are not stored, so records and to_array are empty.
+    Only timesteps are summarized,
+    the initial state of storage logs is skipped (see append_initial).
+    '''
+    thresholds: dict[str, float] = field(default_factory=dict)
+    '''Column names (keys) and thresholds (values) used to count records with values below them.'''
+    count: int = 0
+    '''Number of records summarized.'''
+    mean: np.ndarray = field(default_factory=lambda: np.zeros(0), repr=False)
+    '''Mean of each record value.'''
+    m2: np.ndarray = field(default_factory=lambda: np.zeros(0), repr=False)
+    '''Sum of squared differences from the mean of each record value.'''
+    minimum: np.ndarray = field(default_factory=lambda: np.zeros(0), repr=False)
+    '''Minimum of each record value.'''
+    maximum: np.ndarray = field(default_factory=lambda: np.zeros(0), repr=False)
+    '''Maximum of each record value.'''
+    below: dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+    '''Column names (keys) and number of records with values below their threshold (values).'''
+
+    @property
+    def variance(self) -> np.ndarray:
+        '''Return (population) variance of each record value.'''
+        return self.m2 / self.count if self.count else np.full_like(self.m2, np.nan)
+
+    def reserve(self, rows: int, members: None|int = None) -> None:
+        pass
+
+    def append_initial(self, record: Any) -> None:
+        pass
+
+    def append(self, record: Any) -> None:
+        values = np.stack(np.broadcast_arrays(*flatten_record(record)), axis=-1).astype(float)
+        if not self.count:
+            self.extend(values[np.newaxis])
+            return
+        # Welford's update.
+        self.count += 1
+        delta = values - self.mean
+        self.mean = self.mean + delta / self.count
+        self.m2 = self.m2 + delta * (values - self.mean)
+        self.minimum = np.minimum(self.minimum, values)
+        self.maximum = np.maximum(self.maximum, values)
+        self.__count_below(values[np.newaxis])
+
+    def extend(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        if not n:
+            return
+        mean = values.mean(axis=0)
+        m2 = ((values - mean) ** 2).sum(axis=0)
+        if not self.count:
+            self.mean, self.m2 = mean, m2
+            self.minimum, self.maximum = values.min(axis=0), values.max(axis=0)
+        else:
+            # Chan's parallel update, arrays broadcast to a member dimension for ensembles.
+            total = self.count + n
+            delta = mean - self.mean
+            self.mean = self.mean + delta * n / total
+            self.m2 = self.m2 + m2 + delta ** 2 * self.count * n / total
+            self.minimum = np.minimum(self.minimum, values.min(axis=0))
+            self.maximum = np.maximum(self.maximum, values.max(axis=0))
+        self.count += n
+        self.__count_below(values)
+
+    def __count_below(self, values: np.ndarray) -> None:
+        columns = self.columns
+        for column, threshold in self.thresholds.items():
+            below = (values[..., columns.index(column)] < threshold).sum(axis=0)
+            self.below[column] = self.below.get(column, 0) + below
+
+    def summary(self) -> pd.DataFrame:
+        '''
+        Return summary statistics, with one row per column (or per member and column for ensembles).
+        '''
+        columns = self.columns
+        members = self.mean.shape[0] if self.mean.ndim == 2 else None
+        statistics = {'count': np.full(self.mean.shape, self.count),
+                      'mean': self.mean, 'variance': self.variance,
+                      'min': self.minimum, 'max': self.maximum,
+                      'below': np.full(self.mean.shape, np.nan)}
+        for column, below in self.below.items():
+            statistics['below'][..., columns.index(column)] = below
+        if members:
+            index = pd.MultiIndex.from_product([range(members), columns],
+                                               names=['member', 'column'])
+        else:
+            index = pd.Index(columns, name='column')
+        return pd.DataFrame({key: np.ravel(value) for key, value in statistics.items()},
+                            index=index)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        '''Return summary statistics as a pandas DataFrame (see summary).'''
+        return self.summary()
+
+class LoggedOperation:
+    '''
+    Node operation that appends its outputs to a log (see Log.logger).
+
+    Unlike a closure, it can be pickled (if the wrapped operation can be pickled).
+    '''
+    def __init__(self, function: Callable[..., Any], log: Log) -> None:
+        self.__wrapped__ = function
+        self.log = log
+
+    def __call__(self, *args, **kwargs) -> Any:
+        output = self.__wrapped__(*args, **kwargs)
+        self.log.append(output)
+        return output
+
+def hook(operations: Callable[..., Any], log: None|Log, enabled: bool) -> Callable[..., Any]:
+    '''
+    Return operations wrapped by a single logger (see Log.logger).
+
+    Operations are returned unchanged if no log is attached or logging is disabled,
+    so nodes without (enabled) logs pay nothing for logging.
+    '''
+    return log.logger(operations) if log is not None and enabled else operations
+
+def flatten_record(record: Any) -> tuple[Any,...]:
+    '''Flattens nested record tuples, for example: (1, 2, (3, 4)) -> (1, 2, 3, 4).'''
+    if not isinstance(record, tuple):
+        return (record,)
+    values = ()
+    for item in record:
+        values += flatten_record(item) if isinstance(item, tuple) else (item,)
+    return values
+
+def flatten_headers(headers: tuple[Any,...]) -> tuple[str,...]:
+    '''
+    Return one column name per record value, repeated names are numbered.
+    For example: ('Inflow', 'Storage', ('Outflow', 'Outflow'))
+    -> ('Inflow', 'Storage', 'Outflow_0', 'Outflow_1').
+    '''
+    names = flatten_record(headers)
+    counts = Counter(names)
+    numbers: dict[str, int] = {}
+    columns = []
+    for name in names:
+        if counts[name] > 1:
+            numbers[name] = numbers.get(name, -1) + 1
+            name = f'{name}_{numbers[name]}'
+        columns.append(name)
+    return tuple(columns)
+
+def nest_record(values: list[Any], headers: tuple[Any,...]) -> Any:
+    '''
+    Nests flat record values like the headers,
+    for example: [1, 2, 3] with ('a', 'b', ('c',)) -> (1, 2, (3,)).
+    Records with a single (not nested) header are returned as a single value.
+    '''
+    if len(headers) == 1 and not isinstance(headers[0], tuple):
+        return values[0]
+    position = iter(values)
+    def nest(group: tuple[Any,...]) -> tuple[Any,...]:
+        return tuple(nest(item) if isinstance(item, tuple) else next(position) for item in group)
+    return nest(headers)
 
 @runtime_checkable
 class Node(Protocol):
@@ -80,11 +534,14 @@ class Node(Protocol):
     name: str
     '''Node name.'''
 
-    # @property
-    # def log(self) -> Log:
-    #     '''Return log object logging node data.'''
-    # def activate_log(self) -> None:
-    #     '''Activate log for node.'''
+    @property
+    def log(self) -> None|Log:
+        '''Return log attached to the node (None if no log is attached).'''
+    @property
+    def logging(self) -> bool:
+        '''Return True if outputs are written to the attached log.'''
+    def hook_log(self, log: None|Log, enabled: bool = True) -> None:
+        '''Sets the attached log (None for no log) and whether it is enabled (without writing).'''
 
     def receive(self) -> float:
         '''Return inflows from upstream senders.'''
@@ -94,6 +551,11 @@ class Node(Protocol):
     def senders(self) -> set[Self]:
         '''Return upstream nodes.'''
 
+    def snapshot(self) -> tuple[Any,...]:
+        '''Return node's dynamic state (state changed by simulations).'''
+    def restore(self, state: tuple[Any,...]) -> None:
+        '''Restore node's dynamic state from a snapshot.'''
+
 class Subscriber(Protocol):
     '''
     A node that can receive inflows from other nodes.
@@ -102,44 +564,195 @@ class Subscriber(Protocol):
         '''Add node that sends flow to this node.'''
     def remove_sender(self, sender: Node) -> None:
         '''Remove node that sends flow to this node.'''
+    def release(self, inflows: float) -> float:
+        '''Return flow to send to downstream receivers, given inflows from upstream senders.'''
 
 def transfer_flow(node: Node) -> float:
     '''
     Transfer flow from upstream sender to downstream receiver.
-    Default send method for input, and outlet nodes.
+    Default send method for input nodes.
     '''
     return node.receive()
 
-class Inflow(Node):
+def pass_flow(flow: float) -> float:
+    '''
+    Pass flow received from upstream senders to downstream receivers unchanged.
+    Default release method for outlet nodes.
+    '''
+    return flow
+
+class LoggedNode:
+    '''
+    Mixin for nodes whose operations can write their outputs to an attached log.
+
+    The node's operations are wrapped by the log's logger only while a log is attached and enabled
+    (see hook), nodes call operations (rather than their unlogged operations) to run them.
+    '''
+    def __init__(self, operations: Callable[..., Any]) -> None:
+        self.__unlogged = operations
+        self.__log: None|Log = None
+        self.__logging = True
+        self.operations = operations
+        '''Node operations, including any logging (set by hook_log).'''
+
+    def detach_log(self, log: None|Log = None) -> None:
+        '''Detaches log (or any log if None) from the node.'''
+        if log is None or log is self.__log:
+            self.hook_log(None, self.__logging)
+
+    def hook_log(self, log: None|Log, enabled: bool = True) -> None:
+        '''
+        Sets the attached log (None for no log) and whether it is enabled, without writing to it.
+        Used to put back logs exactly as they were (see System.simulation),
+        use attach_log to add logs.
+        '''
+        self.__log, self.__logging = log, enabled
+        self.operations = hook(self.__unlogged, log, enabled)
+
+    @property
+    def log(self) -> None|Log:
+        '''Return log attached to the node (None if no log is attached).'''
+        return self.__log
+    @property
+    def logging(self) -> bool:
+        '''Return True if outputs are written to the attached log.'''
+        return self.__log is not None and self.__logging
+
+    def enable_log(self, enabled: bool = True) -> None:
+        '''Enables (or disables) writing outputs to the attached log, without detaching it.'''
+        self.hook_log(self.__log, enabled)
+
+class Inflow(LoggedNode, Node):
     '''
     Upstream most node, can create new inflows.
+
+    Input data is a list (or 1-D array) of inflows for each timestep,
+    or a 2-D (members x timesteps) array for ensemble simulations (see lattice.engine).
+    Lists are converted (once) to read only float arrays, so scenario transforms are views of them.
+    Arrays can be memory-mapped (numpy.memmap) files, see from_file,
+    and text files can be read in chunks (see from_text and lattice.sources),
+    these are read from disk as the simulation runs rather than loaded into memory.
     '''
-    def __init__(self, input_data: list[float],
+    def __init__(self, input_data: list[float]|np.ndarray,
                  name: str = '', starting_position: int = 0,
                  operations: Callable[[Node],float] = transfer_flow,
                  loop: bool = False) -> None:
         self.tag = Tag.INFLOW
+        if isinstance(input_data, list):
+            input_data = np.array(input_data, dtype=float)
+            input_data.flags.writeable = False
         self.data = input_data
         self.name = name if name else self.tag.value
         self.__timestep = starting_position - 1
-        self.__operations = operations
+        super().__init__(operations)
         self.__loop = loop
 
+    @classmethod
+    def from_file(cls, path: str, dtype: Any = '<f8', members: None|int = None,
+                  offset: int = 0, **kwargs: Any) -> Self:
+        '''
+        Return inflow node reading memory-mapped input data from a file.
+
+        Args:
+            path(str): path to a .npy file, or a raw binary file of floats (in timestep order).
+            dtype(Any): data type of values in raw binary files, little-endian float64 by default.
+            members(None|int): number of ensemble members in raw binary files
+                (stored member by member),
+                None by default (if None, the file holds a single series).
+            offset(int): number of bytes before the first value in raw binary files.
+            kwargs(Any): other Inflow arguments (name, starting_position, ...).
+
+        Raises:
+            ValueError: if the raw binary file does not hold a whole number of timesteps.
+        '''
+        if path.endswith('.npy'):
+            return cls(np.load(path, mmap_mode='r'), **kwargs)
+        dtype = np.dtype(dtype)
+        values, remainder = divmod(os.path.getsize(path) - offset, dtype.itemsize * (members or 1))
+        if remainder:
+            raise ValueError(f'''
+                {path} does not hold a whole number of {dtype} values
+                for each of the {members or 1} member(s).''')
+        shape = (values,) if members is None else (members, values)
+        return cls(np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape), **kwargs)
+
+    @classmethod
+    def from_text(cls, path: str, column: int|str = 0, delimiter: str = ',',
+                  header: bool = True, chunk: int = 8760, **kwargs: Any) -> Self:
+        '''
+        Return inflow node reading input data from a column of a csv (or other delimited text) file.
+
+        Rows are parsed chunk rows at a time, as the simulation reaches them (see TextSource).
+
+        Args:
+            path(str): path to the text file, with one row per timestep.
+            column(int|str): column index, or column name (if the file has a header row).
+            delimiter(str): column delimiter, ',' by default.
+            header(bool): True (default) if the first row holds column names.
+            chunk(int): number of rows parsed at a time.
+            kwargs(Any): other Inflow arguments (name, starting_position, ...).
+        '''
+        return cls(TextSource(path, column, delimiter, header, chunk), **kwargs)
+
     def attach_log(self, log: Log) -> Log:
-        '''Modifies operations to include logging. Returns log headers.'''
-        self.__operations = log.logger(self.__operations)
+        '''Attaches log to the node (replacing any attached log), with logging on. Returns log.'''
+        self.hook_log(log)
         log.headers = ('Inflow',)
         return log
 
-    def receive(self) -> float:
-        if (self.__timestep + 1 == len(self.data)
-            and self.__loop):
+    @property
+    def is_ensemble(self) -> bool:
+        '''Return True if data is a 2-D (members x timesteps) array.'''
+        return getattr(self.data, 'ndim', 1) == 2
+
+    @property
+    def members(self) -> int:
+        '''Return number of ensemble members in data (1 if data is not an ensemble).'''
+        return self.data.shape[0] if self.is_ensemble else 1
+
+    @property
+    def length(self) -> int:
+        '''Return number of timesteps in data.'''
+        return self.data.shape[1] if self.is_ensemble else len(self.data)
+
+    def receive(self) -> float|np.ndarray:
+        if (self.__loop
+            and self.__timestep + 1 == self.length):
             self.reset()
         self.__timestep += 1
-        return self.data[self.__timestep]
+        if self.is_ensemble:
+            return np.asarray(self.data[:, self.__timestep], dtype=float)
+        return float(self.data[self.__timestep])
+
+    def take(self, time_steps: int) -> np.ndarray:
+        '''
+        Return data for the next time_steps, same as calling receive() time_steps times.
+
+        Returns:
+            np.ndarray: (time_steps,) array, or (members, time_steps) array for ensembles.
+        Raises:
+            IndexError: if the data runs out before time_steps and the node does not loop.
+        '''
+        first = self.__timestep + 1
+        if self.__loop and first + time_steps > self.length:
+            steps = np.arange(first, first + time_steps) % self.length
+            self.__timestep = int(steps[-1])
+            return np.asarray(self.data, dtype=float)[..., steps]
+        # slices only read the requested timesteps (of memory-mapped data or text files) from disk,
+        # so the length of the data (which text files only know once they are read) is not needed.
+        if self.is_ensemble:
+            values = np.asarray(self.data[:, first:first + time_steps], dtype=float)
+        else:
+            values = np.asarray(self.data[first:first + time_steps], dtype=float)
+        if values.shape[-1] < time_steps:
+            raise IndexError(f'''
+                {time_steps} time steps requested from {self.name} node,
+                only {values.shape[-1]} remaining.''')
+        self.__timestep += time_steps
+        return values
 
     def send(self) -> float:
-        return self.__operations(self)
+        return self.operations(self)
     def senders(self) -> set[Node]:
         return set()
 
@@ -147,7 +760,72 @@ class Inflow(Node):
         '''Reset node starting position for inflow to first timestep in data.'''
         self.__timestep = -1
 
-class Storage(Node, Subscriber):
+    def snapshot(self) -> tuple[int]:
+        return (self.__timestep,)
+    def restore(self, state: tuple[int]) -> None:
+        self.__timestep = state[0]
+
+    def __getstate__(self) -> dict[str, Any]:
+        '''
+        Return node state for pickling.
+
+        List data is pickled as a float array: a single buffer
+        that pickle protocol 5 can pass out-of-band, without copying it.
+        Memory-mapped files are pickled by path, and mapped again (read only) when unpickled.
+        '''
+        state = self.__dict__.copy()
+        if isinstance(self.data, list):
+            state['data'] = np.asarray(self.data, dtype=float)
+        elif isinstance(self.data, np.memmap) and isinstance(self.data.base, mmap.mmap):
+            state['data'] = MappedFile(self.data.filename, self.data.dtype.str,
+                                       self.data.shape, self.data.offset)
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        if isinstance(state['data'], MappedFile):
+            state['data'] = state['data'].open()
+        self.__dict__.update(state)
+
+def inflows_from_table(table: str|pd.DataFrame|np.ndarray,
+                       names: None|tuple[str,...] = None,
+                       read_kwargs: None|dict[str, Any] = None, **kwargs: Any) -> dict[str, Inflow]:
+    '''
+    Return inflow nodes for each column of a wide table (see lattice.sources.read_table).
+
+    The table is read once into a single array, each node's data is a view of one row of the array.
+
+    Args:
+        table(str|pd.DataFrame|np.ndarray): path to a csv or .npy file, a DataFrame or a 2-D array.
+        names(None|tuple[str,...]): column names (used as node names), None by default
+            (if None, all columns).
+        read_kwargs(None|dict[str, Any]): pandas.read_csv arguments (for csv files),
+            for example: {'index_col': 0}, None by default.
+        kwargs(Any): other Inflow arguments (starting_position, loop, ...).
+
+    Returns:
+        dict[str, Inflow]: column names (keys) and inflow nodes (values).
+    '''
+    names, data = read_table(table, names, **(read_kwargs or {}))
+    return {name: Inflow(data[i], name=name, **kwargs) for i, name in enumerate(names)}
+
+@dataclass(frozen=True)
+class MappedFile:
+    '''Location of memory-mapped inflow data, used to pickle Inflow nodes without copying it.'''
+    path: str
+    '''Path to the file.'''
+    dtype: str
+    '''Data type string, for example: '<f8'.'''
+    shape: tuple[int,...]
+    '''Shape of the data.'''
+    offset: int
+    '''Number of bytes before the data.'''
+
+    def open(self) -> np.memmap:
+        '''Return read only memory-mapped data.'''
+        return np.memmap(self.path, dtype=self.dtype, mode='r', offset=self.offset,
+                         shape=self.shape)
+
+class Storage(LoggedNode, Node, Subscriber):
     '''
     Node that can store inflows.
     '''
@@ -157,13 +835,15 @@ class Storage(Node, Subscriber):
         self.reservoir = reservoir
         self.name = name if name else self.tag.value
         self.__senders = senders if senders else set()
-        self.__operations = reservoir.operate
+        super().__init__(reservoir.operate)
 
     def attach_log(self, log: Log) -> Log:
-        '''Modifies operations to include logging.'''
-        self.__operations = log.logger(self.__operations)
-        log.records.append(self.reservoir.current_state)
+        '''Attaches log to the node (replacing any attached log), with logging on. Returns log.'''
+        self.hook_log(log)
         log.headers = self.reservoir.output_headers()
+        # reservoir outputs are (inflow, storage, outflows), whatever their headers are named.
+        log.averaged = (1,)
+        log.append_initial(self.reservoir.current_state)
         return log
 
     @property
@@ -175,8 +855,9 @@ class Storage(Node, Subscriber):
         return sum(sender.send() for sender in self.senders())
 
     def send(self) -> float:
-        inflows = self.receive()
-        operation_outputs = self.__operations(inflows)
+        return self.release(self.receive())
+    def release(self, inflows: float) -> float:
+        operation_outputs = self.operations(inflows)
         # sum together all releases
         return sum(operation_outputs[2])
     def senders(self) -> set[Node]:
@@ -192,18 +873,23 @@ class Storage(Node, Subscriber):
         '''
         self.reservoir.storage = storage
 
-class Outlet(Node, Subscriber):
+    def snapshot(self) -> tuple[Any,...]:
+        return self.reservoir.snapshot()
+    def restore(self, state: tuple[Any,...]) -> None:
+        self.reservoir.restore(state)
+
+class Outlet(LoggedNode, Node, Subscriber):
     '''Node that sends flow out of the system.'''
     def __init__(self, name: str = '',
                  senders: None|set[Node] = None) -> None:
         self.tag = Tag.OUTLET
         self.name = name if name else self.tag.value
         self.__senders = senders if senders else set()
-        self.__operations = transfer_flow
+        super().__init__(pass_flow)
 
     def attach_log(self, log: Log) -> Log:
-        '''Modifies operations to include logging.'''
-        self.__operations = log.logger(self.__operations)
+        '''Attaches log to the node (replacing any attached log), with logging on. Returns log.'''
+        self.hook_log(log)
         log.headers = ('Outflow',)
         return log
 
@@ -212,10 +898,17 @@ class Outlet(Node, Subscriber):
         return sum(sender.send() for sender in self.senders())
 
     def send(self) -> float:
-        return self.__operations(self)
+        return self.release(self.receive())
+    def release(self, inflows: float) -> float:
+        return self.operations(inflows)
     def senders(self) -> set[Node]:
         return self.__senders
     def add_sender(self, sender: Node) -> None:
         self.__senders.add(sender)
     def remove_sender(self, sender: Node) -> None:
         self.__senders.remove(sender)
+
+    def snapshot(self) -> tuple[()]:
+        return ()
+    def restore(self, state: tuple[()]) -> None:
+        pass
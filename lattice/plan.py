@@ -0,0 +1,145 @@
+'''
+Compiled system execution plans.
+
+A plan is a flat, topologically ordered view of a linked system diagram.
+It is built once, and then used to advance every node in the system
+without recursively pulling flows through the outlet's senders.
+
+Nodes are numbered by their position in the flattened diagram:
+- The outlet node is always node 0.
+- Inflow nodes have the largest positions.
+
+Senders are always in the layer upstream of their receiver,
+so running nodes from the largest to the smallest position
+guarantees all senders are run before their receivers.
+
+Simple example (see lattice.system):
+[
+[outlet_node],  # node 0
+[storage_node], # node 1
+[inflow_node]   # node 2
+]
+has the order (2, 1, 0), offsets (0, 1, 2, 2), senders (1, 2)
+and receivers (-1, 0, 1).
+'''
+from itertools import count
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+from lattice.node import Node
+
+@dataclass(frozen=True)
+class Plan:
+    '''
+    Flat, topologically ordered representation of a linked system diagram.
+    '''
+    nodes: tuple[Node,...]
+    '''Nodes in flattened diagram order.'''
+    order: tuple[int,...]
+    '''Node positions in execution order (senders before receivers).'''
+    offsets: tuple[int,...]
+    '''Sender offsets, senders of node i are senders[offsets[i]:offsets[i+1]].'''
+    senders: tuple[int,...]
+    '''Positions of sender nodes, grouped by receiving node.'''
+    receivers: tuple[int,...]
+    '''Position of the node receiving flow from each node, -1 for the outlet.'''
+    layers: tuple[int,...]
+    '''Layer offsets, nodes in layer k are at positions layers[k] to layers[k+1].'''
+
+    def senders_of(self, position: int) -> tuple[int,...]:
+        '''Return positions of nodes sending flow to the node at position.'''
+        return self.senders[self.offsets[position]:self.offsets[position + 1]]
+
+def compile_plan(layers: list[list[Node]]) -> Plan:
+    '''
+    Compiles flattened layers of a linked system diagram into an execution plan.
+
+    Args:
+        layers(list[list[Node]]): flattened layers of a linked system diagram.
+
+    Returns:
+        Plan: execution plan for the system.
+    Raises:
+        ValueError: if a sender is not in the layer upstream of its receiver.
+    '''
+    nodes, bounds = [], [0]
+    for layer in layers:
+        nodes.extend(layer)
+        bounds.append(len(nodes))
+    positions = {id(node): i for i, node in enumerate(nodes)}
+
+    offsets, senders, receivers = [0], [], [-1] * len(nodes)
+    for i, node in enumerate(nodes):
+        for sender in node.senders():
+            j = positions.get(id(sender), -1)
+            if j < i:
+                raise ValueError(
+                    f'''
+                    Sender {sender.name} of node {node.name}
+                    is not upstream of it in the system diagram.
+                    '''
+                )
+            senders.append(j)
+            receivers[j] = i
+        offsets.append(len(senders))
+    return Plan(nodes=tuple(nodes), order=tuple(range(len(nodes) - 1, -1, -1)),
+                offsets=tuple(offsets), senders=tuple(senders),
+                receivers=tuple(receivers), layers=tuple(bounds))
+
+def compile_program(plan: Plan) -> tuple[tuple[int, Callable[..., float], tuple[int,...]],...]:
+    '''
+    Return the plan's nodes as (position, operation, sender positions) in execution order.
+
+    Nodes without senders are run with send(), all other nodes are run with release().
+    '''
+    return tuple((i, plan.nodes[i].release if plan.senders_of(i) else plan.nodes[i].send,
+                  plan.senders_of(i)) for i in plan.order)
+
+def advance(program: tuple[tuple[int, Callable[..., float], tuple[int,...]],...],
+            flows: list[float]) -> None:
+    '''
+    Runs each node in a compiled program (see compile_program) once, for a single time step.
+
+    Args:
+        program(tuple[tuple[int, Callable[..., float], tuple[int,...]],...]): compiled program.
+        flows(list[float]): outflows of each node (by position), updated in place.
+    '''
+    for i, operation, senders in program:
+        if not senders:
+            flows[i] = operation()
+        elif len(senders) == 1:
+            flows[i] = operation(flows[senders[0]])
+        else:
+            flows[i] = operation(sum(flows[j] for j in senders))
+
+def run_plan(plan: Plan, time_steps: int) -> None:
+    '''
+    Runs the nodes in the plan for a number of time steps.
+
+    Each node is run once per time step, after all of its senders.
+    Inflow nodes send new flows, all other nodes release the sum of their senders flows.
+    Flows are passed between nodes in a flat list rather than by nested send() calls.
+    '''
+    program = compile_program(plan)
+    flows = [0.0] * len(plan.nodes)
+    for _ in range(time_steps):
+        advance(program, flows)
+
+def iter_plan(plan: Plan, time_steps: None|int = None) -> Iterator[list[float]]:
+    '''
+    Runs the nodes in the plan one time step at a time (see run_plan), as the caller iterates.
+
+    Args:
+        plan(Plan): compiled system plan.
+        time_steps(None|int): number of time steps, None by default
+            (if None, until the caller stops).
+
+    Yields:
+        list[float]: outflows of each node (by position) in the time step,
+            the same list is updated in place and yielded each time step.
+    '''
+    program = compile_program(plan)
+    flows = [0.0] * len(plan.nodes)
+    for _ in (count() if time_steps is None else range(time_steps)):
+        advance(program, flows)
+        yield flows
@@ -7,7 +7,9 @@ new class(es) that implements the Reservoir protocol.
 For example, the canteen model can be used here.
 '''
 
-from typing import Protocol, Callable
+from typing import Protocol, Callable, Any
+
+import numpy as np
 
 type Output = tuple[float, float, tuple[float,...]]
 
@@ -32,6 +34,10 @@ class Reservoir(Protocol):
         '''
     def output_headers(self) -> tuple[str, str, tuple[str,...]]:
         '''Return output headers.'''
+    def snapshot(self) -> tuple[Any,...]:
+        '''Return reservoir's dynamic state (state changed by operations).'''
+    def restore(self, state: tuple[Any,...]) -> None:
+        '''Restore reservoir's dynamic state from a snapshot.'''
 
 type Operations_Function = Callable[[Reservoir, float], Output]
 
@@ -50,6 +56,35 @@ def passive_operation(reservoir: Reservoir, inflow: float) -> Output:
 passive_operation_headers: tuple[str, str, tuple[str,...]] = ('Inflow', 'Storage', ('Outflow',))
 '''Return output headers.'''
 
+def passive_operation_array(storage: np.ndarray, capacity: np.ndarray,
+                            inflow: np.ndarray) -> np.ndarray:
+    '''
+    Passively operates an array of reservoirs, same as passive_operation for each element.
+
+    Modifies storage in place and returns the (spilled) releases.
+    '''
+    total = storage + inflow
+    release = np.maximum(total - capacity, 0)
+    np.minimum(total, capacity, out=storage)
+    return release
+
+def passive_operation_series(storage: float, capacity: float,
+                             inflows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Passively operates a reservoir over a series of inflows,
+    same as repeated passive_operation calls.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: storage and (spilled) release at the end of each timestep.
+    '''
+    storages, releases = [], []
+    for inflow in inflows.tolist():
+        total = storage + inflow
+        releases.append(max(0, total - capacity))
+        storage = min(capacity, total)
+        storages.append(storage)
+    return np.array(storages, dtype=float), np.array(releases, dtype=float)
+
 
 class BasicReservoir(Reservoir):
     '''
@@ -68,8 +103,18 @@ class BasicReservoir(Reservoir):
         outflows = len(self.output_headers()[2])
         return (0, self.storage, tuple([0] * outflows))
 
+    @property
+    def operations(self) -> Operations_Function:
+        '''Return function used to operate the reservoir.'''
+        return self.__operations
+
     def operate(self, inflow: float) -> Output:
         return self.__operations(self, inflow)
 
     def output_headers(self) -> tuple[str, str, tuple[str,...]]:
         return self.__output_headers
+
+    def snapshot(self) -> tuple[float]:
+        return (self.storage,)
+    def restore(self, state: tuple[float]) -> None:
+        self.storage = state[0]
@@ -0,0 +1,89 @@
+'''
+Memory-mapped simulation results.
+
+All node logs of a simulation can be backed by a single (nodes, records, fields) .npy file
+((nodes, records, members, fields) for ensembles),
+so results larger than memory are paged to and from disk by the operating system.
+
+An index file (same path with a .json suffix) stores the node names, headers and number of records,
+so results can be reopened later (with numpy.load) without parsing or loading any data.
+'''
+import json
+from typing import Any
+
+import numpy as np
+
+from lattice.node import Log, SummaryLog
+
+def index_path(path: str) -> str:
+    '''Return path of the index file for the results file at path.'''
+    return f'{path}.json'
+
+def map_logs(logs: dict[str, Log], rows: int, path: str, members: None|int = None) -> np.memmap:
+    '''
+    Backs logs with a single memory-mapped .npy file, records already in the logs are copied to it.
+    Summary logs (see lattice.node.SummaryLog) do not hold records, and are skipped.
+
+    Args:
+        logs(dict[str, Log]): node names (keys) and node logs (values),
+            as returned by System.add_logs.
+        rows(int): number of records to reserve for each node.
+        path(str): path to the results (.npy) file.
+        members(None|int): number of ensemble members, None by default
+            (if None, logs are not from ensembles).
+
+    Returns:
+        np.memmap: (nodes, rows, fields) array,
+            or (nodes, rows, members, fields) array for ensembles,
+            with nodes in the same order as (mapped) logs.
+    Raises:
+        ValueError: if any of the logs has a sink.
+    '''
+    logs = {name: log for name, log in logs.items() if not isinstance(log, SummaryLog)}
+    if any(log.sink is not None for log in logs.values()):
+        raise ValueError('Logs with sinks cannot be memory-mapped.')
+    fields = max((log.fields for log in logs.values()), default=0)
+    shape = (len(logs), rows) + ((members,) if members else ()) + (fields,)
+    data = np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=shape)
+    for i, log in enumerate(logs.values()):
+        view = data[i, ..., :log.fields]
+        if log.size:
+            # records written before an ensemble simulation are the same for every member.
+            values = log.to_array()
+            view[:log.size] = values[:, np.newaxis] if members and not log.members else values
+        log.data = view
+    return data
+
+def write_index(logs: dict[str, Log], path: str) -> None:
+    '''Writes the index file for logs backed by the results file at path (see map_logs).'''
+    index = {name: {'headers': log.headers, 'records': log.size} for name, log in logs.items()
+             if not isinstance(log, SummaryLog)}
+    with open(index_path(path), 'w', encoding='utf-8') as file:
+        json.dump(index, file)
+
+def load_logs(path: str, mode: str = 'r') -> dict[str, Log]:
+    '''
+    Opens memory-mapped simulation results.
+
+    Args:
+        path(str): path to the results (.npy) file.
+        mode(str): numpy.load memory-map mode, 'r' (read only) by default.
+
+    Returns:
+        dict[str, Log]: node names (keys) and node logs (values),
+            log data is read from disk on demand.
+    '''
+    with open(index_path(path), 'r', encoding='utf-8') as file:
+        index = json.load(file)
+    data = np.load(path, mmap_mode=mode)
+    logs = {}
+    for i, (name, entry) in enumerate(index.items()):
+        headers = as_tuple(entry['headers'])
+        log = Log(headers=headers)
+        log.data, log.size = data[i, ..., :log.fields], entry['records']
+        logs[name] = log
+    return logs
+
+def as_tuple(headers: list[Any]) -> tuple[Any,...]:
+    '''Converts nested header lists (read from json) back to nested tuples.'''
+    return tuple(as_tuple(item) if isinstance(item, list) else item for item in headers)
@@ -0,0 +1,183 @@
+'''
+Log sinks.
+
+Sinks receive blocks of log records as a simulation runs,
+so logs only need to hold a fixed number of records in memory (see lattice.node.Log).
+Sinks can resume writing a file after the records counted by a checkpoint (see lattice.checkpoint).
+
+New sinks can be added by creating class(es) that implement the Sink protocol.
+'''
+import struct
+from itertools import islice
+from typing import Protocol, IO
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa, pq = None, None
+
+class Sink(Protocol):
+    '''
+    Destination for log records.
+    '''
+    def write(self, block: np.ndarray, columns: tuple[str,...]) -> None:
+        '''Writes a (records, fields) block of records, with one column name per field.'''
+    def close(self) -> None:
+        '''Writes any remaining data and releases the destination.'''
+    def resume(self, records: int) -> None:
+        '''
+        Continues writing to an existing destination after its first records records,
+        later records (written after a checkpoint was saved) are discarded.
+        '''
+
+class CSVSink(Sink):
+    '''
+    Writes log records to a csv file, with a header row of column names.
+
+    The file is flushed after each block,
+    so it holds every record written while the simulation runs.
+    '''
+    def __init__(self, path: str, delimiter: str = ',') -> None:
+        self.path = path
+        self.delimiter = delimiter
+        self.__file: None|IO[str] = None
+
+    def write(self, block: np.ndarray, columns: tuple[str,...]) -> None:
+        if block.ndim != 2:
+            raise ValueError(
+                f'CSV sinks only accept (records, fields) blocks, {block.ndim}-D block found.')
+        if self.__file is None:
+            # pylint: disable-next=consider-using-with
+            self.__file = open(self.path, 'w', encoding='utf-8')
+            self.__file.write(self.delimiter.join(columns) + '\n')
+        np.savetxt(self.__file, block, fmt='%.17g', delimiter=self.delimiter)
+        self.__file.flush()
+
+    def close(self) -> None:
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def resume(self, records: int) -> None:
+        '''
+        Raises:
+            ValueError: if the file holds fewer than records records.
+        '''
+        self.close()
+        if not records:
+            return
+        with open(self.path, 'r+b') as file:
+            # header row and records rows.
+            rows = sum(1 for _ in islice(iter(file.readline, b''), records + 1))
+            if rows < records + 1:
+                raise ValueError(f'{self.path} holds {rows - 1} records, {records} expected.')
+            file.truncate(file.tell())
+        self.__file = open(self.path, 'a', encoding='utf-8') # pylint: disable=consider-using-with
+
+class NpySink(Sink):
+    '''
+    Appends log records to a numpy .npy file (which can be read with numpy.load).
+
+    The file header is rewritten after each block, so the file is valid while the simulation runs.
+    Ensemble logs are written as (records, members, fields) arrays.
+    '''
+    header_size: int = 128
+    '''Bytes reserved for the .npy file header (so it can be rewritten in place).'''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.shape: tuple[int,...] = (0,)
+        self.__file: None|IO[bytes] = None
+
+    def write(self, block: np.ndarray, columns: tuple[str,...]) -> None:
+        if self.__file is None:
+            self.__file = open(self.path, 'wb') # pylint: disable=consider-using-with
+            self.shape = (0,) + block.shape[1:]
+            self.__file.write(self.__header())
+        if block.shape[1:] != self.shape[1:]:
+            raise ValueError(
+                f'Block shape {block.shape} does not match records shape {self.shape[1:]}.')
+        self.__file.write(np.ascontiguousarray(block, dtype='<f8').tobytes())
+        self.shape = (self.shape[0] + len(block),) + self.shape[1:]
+        self.__file.seek(0)
+        self.__file.write(self.__header())
+        self.__file.seek(0, 2)
+        self.__file.flush()
+
+    def close(self) -> None:
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def resume(self, records: int) -> None:
+        '''
+        Raises:
+            ValueError: if the file holds fewer than records records.
+        '''
+        self.close()
+        if not records:
+            return
+        with open(self.path, 'r+b') as file:
+            np.lib.format.read_magic(file)
+            shape = np.lib.format.read_array_header_1_0(file)[0]
+            if shape[0] < records:
+                raise ValueError(f'{self.path} holds {shape[0]} records, {records} expected.')
+            self.shape = (records,) + shape[1:]
+            file.truncate(file.tell() + records * int(np.prod(shape[1:])) * 8)
+            file.seek(0)
+            file.write(self.__header())
+        self.__file = open(self.path, 'r+b') # pylint: disable=consider-using-with
+        self.__file.seek(0, 2)
+
+    def __header(self) -> bytes:
+        # .npy format version 1.0: magic string, version, header length, padded header dictionary.
+        header = repr({'descr': '<f8', 'fortran_order': False,
+                       'shape': self.shape}).encode('latin1')
+        padding = self.header_size - 10 - len(header) - 1
+        return (b'\x93NUMPY\x01\x00' + struct.pack('<H', self.header_size - 10)
+                + header + b' ' * padding + b'\n')
+
+class ParquetSink(Sink):
+    '''
+    Writes log records to a parquet file, one row group per block (requires pyarrow).
+
+    Parquet files are only readable once the sink is closed,
+    so only files closed before a simulation is resumed can be resumed.
+    '''
+    def __init__(self, path: str) -> None:
+        if pq is None:
+            raise ImportError('pyarrow is required to write parquet files.')
+        self.path = path
+        self.__writer = None
+
+    def write(self, block: np.ndarray, columns: tuple[str,...]) -> None:
+        if block.ndim != 2:
+            raise ValueError(
+                f'Parquet sinks only accept (records, fields) blocks, {block.ndim}-D block found.')
+        table = pa.table({column: block[:, i] for i, column in enumerate(columns)})
+        if self.__writer is None:
+            self.__writer = pq.ParquetWriter(self.path, table.schema)
+        self.__writer.write_table(table)
+
+    def close(self) -> None:
+        if self.__writer is not None:
+            self.__writer.close()
+            self.__writer = None
+
+    def resume(self, records: int) -> None:
+        '''
+        Raises:
+            ValueError: if the file holds fewer than records records.
+        '''
+        self.close()
+        if not records:
+            return
+        # parquet files cannot be appended to, kept records are written to a new file.
+        table = pq.read_table(self.path)
+        if len(table) < records:
+            raise ValueError(f'{self.path} holds {len(table)} records, {records} expected.')
+        self.__writer = pq.ParquetWriter(self.path, table.schema)
+        self.__writer.write_table(table.slice(0, records))
@@ -0,0 +1,216 @@
+'''
+Inflow data sources.
+
+Sources hold inflow node input data (see lattice.node.Inflow) outside of memory,
+they are indexed like 1-D arrays but only read the values the simulation asks for.
+
+Wide tables (one column per inflow node) can be read once into a single array (see read_table),
+and shared by many inflow nodes without copying it.
+Scenario variants of the same data (scaled, shifted, clipped) are lazy views of it
+(see TransformedSource).
+'''
+from itertools import islice
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+def read_table(table: str|pd.DataFrame|np.ndarray, names: None|tuple[str,...] = None,
+               **kwargs: Any) -> tuple[tuple[str,...], np.ndarray]:
+    '''
+    Reads a wide table, with one row per timestep and one column per inflow node.
+
+    Args:
+        table(str|pd.DataFrame|np.ndarray): path to a csv or .npy file, a DataFrame or a 2-D array.
+        names(None|tuple[str,...]): column names to read, None by default
+            (if None, all columns of csv files and DataFrames,
+            columns of arrays are named '0', '1', ...).
+        kwargs(Any): other pandas.read_csv arguments (for csv files), for example: index_col=0.
+
+    Returns:
+        tuple[tuple[str,...], np.ndarray]: column names,
+            and a C-contiguous (columns, timesteps) array,
+            so each column's data is a contiguous row of the array.
+    Raises:
+        ValueError: if the table is not 2-D or names are not found in the table.
+    '''
+    if isinstance(table, str):
+        table = np.load(table) if table.endswith('.npy') else pd.read_csv(table, **kwargs)
+    if isinstance(table, pd.DataFrame):
+        columns = tuple(str(column) for column in table.columns)
+        table = table.to_numpy(dtype=float)
+    else:
+        table = np.asarray(table, dtype=float)
+        if table.ndim != 2:
+            raise ValueError(
+                f'Tables must be 2-D (timesteps, columns) arrays, {table.ndim}-D array found.')
+        columns = tuple(str(i) for i in range(table.shape[1]))
+    names = columns if names is None else tuple(names)
+    missing = [name for name in names if name not in columns]
+    if missing:
+        raise ValueError(f'Columns {missing} not found in table columns: {columns}.')
+    positions = [columns.index(name) for name in names]
+    if positions == list(range(len(columns))):
+        return names, np.ascontiguousarray(table.T)
+    return names, np.ascontiguousarray(table[:, positions].T)
+
+class TextSource:
+    '''
+    Column of a csv (or other delimited text) file, read in chunks of rows as a simulation advances.
+
+    Only the current chunk is parsed and held in memory. The byte offset of each chunk is kept,
+    so earlier chunks (after a restore or loop) are read again
+    without re-reading the file from the start.
+    The file is only open while a chunk is read.
+    The file should have one row per timestep, empty rows are not allowed.
+    '''
+    def __init__(self, path: str, column: int|str = 0, delimiter: str = ',',
+                 header: bool = True, chunk: int = 8760) -> None:
+        '''
+        Args:
+            path(str): path to the text file.
+            column(int|str): column index, or column name (if the file has a header row).
+            delimiter(str): column delimiter, ',' by default.
+            header(bool): True (default) if the first row holds column names.
+            chunk(int): number of rows read at a time.
+
+        Raises:
+            ValueError: if column is a name and the file has no header row,
+                or no column has the name.
+        '''
+        self.path = path
+        self.delimiter = delimiter
+        self.chunk = chunk
+        with open(path, 'rb') as file:
+            names = file.readline().decode().strip().split(delimiter) if header else []
+            start = file.tell() if header else 0
+        if isinstance(column, str):
+            names = [name.strip().strip('"\'') for name in names]
+            if column not in names:
+                raise ValueError(f'Column {column} not found in {path} header: {names}.')
+            column = names.index(column)
+        self.column = column
+        self.__offsets = [start]
+        self.__length: None|int = None
+        self.__loaded = -1
+        self.__values = np.zeros(0)
+
+    def __len__(self) -> int:
+        if self.__length is None:
+            # count rows without parsing them.
+            rows, last = 0, b'\n'
+            with open(self.path, 'rb') as file:
+                file.seek(self.__offsets[0])
+                while block := file.read(1 << 20):
+                    rows += block.count(b'\n')
+                    last = block[-1:]
+            self.__length = rows + (last != b'\n')
+        return self.__length
+
+    def __getitem__(self, index: int|slice) -> Any:
+        if isinstance(index, slice):
+            # slices with non-negative bounds are read without counting rows (see __len__).
+            start, stop, step = index.start or 0, index.stop, index.step or 1
+            if start < 0 or stop is None or stop < 0:
+                start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError(f'Text sources only support contiguous slices, step {step} found.')
+            values = []
+            for k in range(start // self.chunk, -(-stop // self.chunk)):
+                chunk = self.__read(k)
+                values.append(chunk[max(start - k * self.chunk, 0):stop - k * self.chunk])
+                if len(chunk) < self.chunk:
+                    break # the file ends in chunk k.
+            return np.concatenate(values) if values else np.zeros(0)
+        if index < 0:
+            index += len(self)
+        k, j = divmod(index, self.chunk)
+        values = self.__read(k)
+        if index < 0 or j >= len(values):
+            raise IndexError(f'Index {index} out of range for {self.path}.')
+        return values[j]
+
+    def __array__(self, dtype: Any = None, copy: Any = None) -> np.ndarray:
+        return np.array(self[:], dtype=dtype, copy=copy)
+
+    def __read(self, k: int) -> np.ndarray:
+        # return values of chunk k, reading (and parsing) it if it is not the current chunk.
+        if k == self.__loaded:
+            return self.__values
+        with open(self.path, 'rb') as file:
+            # skip (without parsing) chunks whose offsets are not known yet.
+            file.seek(self.__offsets[-1])
+            while len(self.__offsets) <= k:
+                if sum(1 for _ in islice(iter(file.readline, b''), self.chunk)) < self.chunk:
+                    return np.zeros(0)
+                self.__offsets.append(file.tell())
+            file.seek(self.__offsets[k])
+            lines = [line.decode() for line in islice(iter(file.readline, b''), self.chunk)]
+            if len(self.__offsets) == k + 1:
+                self.__offsets.append(file.tell())
+        # the file ends at the end of the previous chunk (its length is a multiple of chunk).
+        if not lines:
+            return np.zeros(0)
+        self.__values = np.loadtxt(lines, delimiter=self.delimiter, usecols=self.column,
+                                   dtype=float, ndmin=1)
+        self.__loaded = k
+        return self.__values
+
+    def __getstate__(self) -> dict[str, Any]:
+        '''Return source state for pickling, without the current chunk.'''
+        state = self.__dict__.copy()
+        state['_TextSource__loaded'] = -1
+        state['_TextSource__values'] = np.zeros(0)
+        return state
+
+class TransformedSource:
+    '''
+    Lazy view of inflow data: values are scaled, shifted and then clipped as they are read.
+
+    The underlying data is shared (never copied) and read only, so any number of
+    scenario variants can reference the same record without holding a copy of it.
+    '''
+    def __init__(self, data: Any, scale: float = 1.0, shift: float = 0.0,
+                 lower: None|float = None, upper: None|float = None) -> None:
+        '''
+        Args:
+            data(Any): list, array (1-D or 2-D ensemble), memory-mapped array or other source.
+            scale(float): factor values are multiplied by, 1 by default.
+            shift(float): offset added to scaled values, 0 by default.
+            lower(None|float): lower bound of transformed values, None (no bound) by default.
+            upper(None|float): upper bound of transformed values, None (no bound) by default.
+        '''
+        if isinstance(data, list):
+            data = np.array(data, dtype=float)
+        if isinstance(data, np.ndarray):
+            # a view keeps the data's dtype (values are converted to float as they are read).
+            data = data.view()
+            data.flags.writeable = False
+        self.data = data
+        self.scale = scale
+        self.shift = shift
+        self.lower = lower
+        self.upper = upper
+
+    @property
+    def ndim(self) -> int:
+        '''Return number of dimensions of the data.'''
+        return getattr(self.data, 'ndim', 1)
+
+    @property
+    def shape(self) -> tuple[int,...]:
+        '''Return shape of the data.'''
+        return getattr(self.data, 'shape', (len(self.data),))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index: Any) -> Any:
+        values = np.asarray(self.data[index], dtype=float) * self.scale + self.shift
+        if self.lower is not None or self.upper is not None:
+            values = np.clip(values, self.lower, self.upper)
+        return values
+
+    def __array__(self, dtype: Any = None, copy: Any = None) -> np.ndarray:
+        return np.array(self[...] if isinstance(self.data, np.ndarray) else self[:],
+                        dtype=dtype, copy=copy)
@@ -0,0 +1,124 @@
+'''
+Synthetic (stochastic) streamflow traces.
+
+Traces are generated together, as a single (traces, timesteps) array,
+which can be used directly as ensemble inflow data (see lattice.node.Inflow),
+or split into scenarios (see lattice.system.Scenario).
+
+Random numbers are drawn from numpy Generators. Independent, reproducible streams
+(for example one per worker process, see streams) are spawned from a single seed.
+'''
+from typing import Any
+
+import numpy as np
+
+def streams(seed: None|int, count: int) -> list[np.random.Generator]:
+    '''
+    Return count independent random number generators spawned from seed.
+
+    The streams do not overlap, so traces generated by different workers are independent,
+    and the same seed always gives the same traces.
+    '''
+    return [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(count)]
+
+def fit_thomas_fiering(history: Any,
+                       seasons: int = 12) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Estimates seasonal lag-1 autoregressive (Thomas-Fiering) model parameters.
+
+    Args:
+        history(Any): 1-D historical record, starting in the first season.
+        seasons(int): number of seasons (12 for monthly data).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: (seasons,) arrays of means, standard deviations
+            and correlations of each season with the previous season.
+    Raises:
+        ValueError: if the record does not hold at least two values for each season.
+    '''
+    history = np.asarray(history, dtype=float)
+    if len(history) < 2 * seasons:
+        raise ValueError(f'''
+            At least two values are needed for each of the {seasons} seasons,
+            {len(history)} values found.''')
+    season = np.arange(len(history)) % seasons
+    mean = np.array([history[season == s].mean() for s in range(seasons)])
+    std = np.array([history[season == s].std() for s in range(seasons)])
+    # correlation of each value with the value before it, grouped by season.
+    anomaly = (history - mean[season]) / np.where(std > 0, std, 1)[season]
+    products = anomaly[1:] * anomaly[:-1]
+    correlation = np.array([products[season[1:] == s].mean() for s in range(seasons)])
+    return mean, std, np.clip(correlation, -1, 1)
+
+def thomas_fiering(history: Any, traces: int, length: int, seasons: int = 12,
+                   rng: None|int|np.random.Generator = None,
+                   lower: None|float = 0.0) -> np.ndarray:
+    '''
+    Generates traces with a seasonal lag-1 autoregressive (Thomas-Fiering) model fit to history.
+
+    Each timestep is computed for all traces at once, where s is the season of t:
+    x[t] = mean[s] + correlation[s] * std[s] / std[s-1] * (x[t-1] - mean[s-1])
+           + noise * std[s] * sqrt(1 - correlation[s]^2).
+
+    Args:
+        history(Any): 1-D historical record, starting in the first season.
+        traces(int): number of traces.
+        length(int): number of timesteps in each trace (starting in the first season).
+        seasons(int): number of seasons (12 for monthly data).
+        rng(None|int|np.random.Generator): random number generator or seed (see streams).
+        lower(None|float): lower bound of generated flows, 0 by default
+            (if None, flows are not bounded).
+
+    Returns:
+        np.ndarray: (traces, length) array.
+    '''
+    mean, std, correlation = fit_thomas_fiering(history, seasons)
+    rng = np.random.default_rng(rng)
+    noise = rng.standard_normal((length, traces))
+    # (length, traces) so each timestep is a contiguous row.
+    values = np.empty((length, traces))
+    previous = np.zeros(traces) # standardized value of the previous timestep.
+    for t in range(length):
+        s = t % seasons
+        r = correlation[s] if t else 0.0
+        previous = r * previous + np.sqrt(1 - r * r) * noise[t]
+        values[t] = mean[s] + std[s] * previous
+    if lower is not None:
+        np.maximum(values, lower, out=values)
+    return np.ascontiguousarray(values.T)
+
+def block_bootstrap(history: Any, traces: int, length: int, block: int = 12,
+                    seasons: None|int = 12,
+                    rng: None|int|np.random.Generator = None) -> np.ndarray:
+    '''
+    Generates traces by joining randomly selected blocks of the historical record.
+
+    Args:
+        history(Any): 1-D historical record, starting in the first season.
+        traces(int): number of traces.
+        length(int): number of timesteps in each trace (starting in the first season).
+        block(int): number of timesteps in each block.
+        seasons(None|int): number of seasons (12 for monthly data), blocks start in the same season
+            as the timestep they are copied to (block should be a multiple of seasons).
+            None by default, if None, blocks start at any timestep.
+        rng(None|int|np.random.Generator): random number generator or seed (see streams).
+
+    Returns:
+        np.ndarray: (traces, length) array.
+    Raises:
+        ValueError: if the record is shorter than a block.
+    '''
+    history = np.asarray(history, dtype=float)
+    if len(history) < block:
+        raise ValueError(
+            f'Record of {len(history)} values is shorter than blocks of {block} values.')
+    rng = np.random.default_rng(rng)
+    blocks = -(-length // block)
+    if seasons is None:
+        starts = rng.integers(0, len(history) - block + 1, size=(traces, blocks))
+    else:
+        # first season starts that leave room for a whole block.
+        starts = seasons * rng.integers(0, (len(history) - block) // seasons + 1,
+                                        size=(traces, blocks))
+    index = (starts[:, :, np.newaxis] + np.arange(block)).reshape(traces, blocks * block)
+    return history[index[:, :length]]
@@ -55,9 +55,23 @@ Graphically: this system looks like this:
                         |               |
                      InflowNode2     InflowNode3
 '''
-import copy
-
-from lattice.node import Node, Log, Tag
+import os
+import math
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from lattice.node import Node, Log, SummaryLog, Tag
+from lattice.sinks import Sink
+from lattice.sources import TransformedSource, read_table
+from lattice.results import map_logs, write_index
+from lattice.plan import Plan, compile_plan, compile_program, iter_plan, advance
+from lattice.engine import Engine, run, ensemble_members
+from lattice.checkpoint import save_checkpoint, load_checkpoint, checkpoint_steps
 
 # type Links = list[tuple[int, int]]
 # type DraftLayer = list[Node|list[Node]]
@@ -226,6 +240,97 @@ def fix_diagram(diagram: list[list[Node|list[Node]]]) -> tuple[tuple[Node|tuple[
         _diagram.append(tuple(_layer))
     return tuple(_diagram)
 
+@dataclass
+class Scenario:
+    '''
+    Changes made to a system for a single simulation (see System.run_many).
+    '''
+    inflows: dict[str, list[float]|np.ndarray] = field(default_factory=dict)
+    '''Inflow node names (keys) and input data (values).'''
+    capacities: dict[str, float] = field(default_factory=dict)
+    '''Storage node names (keys) and reservoir capacities (values).'''
+    storages: dict[str, float] = field(default_factory=dict)
+    '''Storage node names (keys) and initial stored volumes (values).'''
+    transforms: dict[str, dict[str, float]] = field(default_factory=dict)
+    '''
+    Inflow node names (keys) and TransformedSource arguments (values),
+    for example: {'inflow': {'scale': 1.1}}.
+    Transformed data are lazy views of the node's (shared) data,
+    so scenarios never copy inflow data.
+    '''
+
+    @classmethod
+    def from_table(cls, table: str|pd.DataFrame|np.ndarray,
+                   names: None|tuple[str,...] = None, **kwargs: Any) -> 'Scenario':
+        '''
+        Return scenario replacing the data of inflow nodes named like columns of a wide table.
+
+        The table is read once into a single array (see lattice.sources.read_table),
+        inflow data are views of its rows, so applying the scenario does not copy data.
+
+        Args:
+            table(str|pd.DataFrame|np.ndarray): path to a csv or .npy file,
+                a DataFrame or a 2-D array.
+            names(None|tuple[str,...]): inflow node (column) names, None by default
+                (if None, all columns).
+            kwargs(Any): other pandas.read_csv arguments (for csv files), for example: index_col=0.
+        '''
+        names, data = read_table(table, names, **kwargs)
+        return cls(inflows={name: data[i] for i, name in enumerate(names)})
+
+    def apply(self, system: 'System') -> 'Scenario':
+        '''
+        Modifies system nodes in place.
+
+        Returns:
+            Scenario: scenario that undoes the changes (restores the replaced values).
+        '''
+        undo = Scenario()
+        for name, data in self.inflows.items():
+            node = system.node_by_name(name)
+            undo.inflows[name] = node.data
+            node.data = data
+        for name, transform in self.transforms.items():
+            node = system.node_by_name(name)
+            undo.inflows.setdefault(name, node.data)
+            node.data = TransformedSource(node.data, **transform)
+        for name, capacity in self.capacities.items():
+            node = system.node_by_name(name)
+            undo.capacities[name] = node.reservoir.capacity
+            node.reservoir.capacity = capacity
+        for name, storage in self.storages.items():
+            node = system.node_by_name(name)
+            undo.storages[name] = node.volume
+            node.reset(storage)
+        return undo
+
+# system shipped once to each run_many worker process.
+_worker_system: 'None|System' = None
+
+def _initialize_worker(system: 'System') -> None:
+    '''Stores the system sent to a run_many worker process.'''
+    global _worker_system # pylint: disable=global-statement
+    _worker_system = system
+
+def _run_scenario(i: int, scenario: Scenario, time_steps: int,
+                  log_nodes: None|tuple[str,...], engine: Engine,
+                  memory_name: str, shape: tuple[int, int],
+                  layout: dict[str, tuple[int, tuple[int,...]]]) -> None:
+    '''Runs scenario i in a worker process, writes logs to row i of the shared memory results.'''
+    undo = scenario.apply(_worker_system)
+    try:
+        logs = _worker_system.simulation(time_steps, log_nodes, engine)
+    finally:
+        undo.apply(_worker_system)
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        results = np.ndarray(shape, dtype=float, buffer=memory.buf)
+        for name, (start, log_shape) in layout.items():
+            results[i, start:start + math.prod(log_shape)] = logs[name].to_array().reshape(-1)
+        del results
+    finally:
+        memory.close()
+
 class System:
     '''
     A system is a collection of nodes that are connected in a specific way.
@@ -233,78 +338,410 @@ class System:
     def __init__(self, diagram: list[list[Node|list[Node]]]) -> None:
         self.diagram = fix_diagram(link_diagram(diagram))
         self.format_node_names() # sets unique names for nodes, modifies diagram in place.
+        self.plan: Plan = compile_plan([flatten_layer(layer) for layer in self.diagram])
+        self.__positions: dict[str, int] = {}
+        self.__steps: dict[frozenset[str], tuple[Any,...]] = {} # compiled step programs (see step)
+        self.index_node_names()
+        self.__initial_state = self.snapshot()
 
 
         #self.logs = {node: node.log for node in flatten_diagram(diagram) if not node.log is None}
 
+    def index_node_names(self) -> None:
+        '''
+        Indexes node names (name -> position in system plan).
+
+        Called when the system is built, and again if a node is renamed.
+        '''
+        self.__positions = {node.name: i for i, node in enumerate(self.plan.nodes)}
+        self.__steps = {}
+
+    def node_index(self, name: str) -> int:
+        '''
+        Return position of node in the system plan by name.
+        '''
+        i = self.__positions.get(name)
+        if i is None or self.plan.nodes[i].name != name:
+            # a node has been renamed, rebuild the index.
+            self.index_node_names()
+            i = self.__positions.get(name)
+            if i is None:
+                raise ValueError(f'Node {name} not found in system.')
+        return i
+
     def node_by_name(self, name: str) -> Node:
         '''
         Return node by name.
         '''
-        for node in flatten_diagram(self.diagram):
-            if node.name == name:
-                return node
-        raise ValueError(f'Node {name} not found in system.')
+        return self.plan.nodes[self.node_index(name)]
 
     def format_node_names(self) -> None:
         '''
         Format node names so no duplicates exist.
+
+        Duplicated names are numbered in diagram order: name_1, name_2, ...
         '''
-        names = []
-        dupes = []
+        names: set[str] = set()
+        firsts: dict[str, Node] = {} # first node with each name
+        suffixes: dict[str, int] = {} # next suffix to try for each duplicated name
         for node in flatten_diagram(self.diagram):
-            i: int = 2 # original set to name + 1 later
             name = node.name
-            while name in names:
-                if i == 2: # first pass
-                    dupes.append(name)
+            if name in names:
+                i = suffixes.get(node.name, 2) # original set to name + 1 later
+                while f'{node.name}_{i}' in names:
+                    i += 1
                 name = f'{node.name}_{i}'
-                i += 1
+                suffixes[node.name] = i + 1
+            firsts[name] = node
             node.name = name
-            names.append(name)
+            names.add(name)
         # set original to name + 1
-        for name in dupes:
-            for node in flatten_diagram(self.diagram):
-                if node.name == name:
-                    node.name = f'{name}_1'
+        for name in suffixes:
+            firsts[name].name = f'{name}_1'
 
-    def add_logs(self, names: None|tuple[str,...]) -> dict[str, Log]:
+    def add_logs(self, names: None|tuple[str,...],
+                 sinks: None|dict[str, Sink] = None,
+                 summaries: None|dict[str, dict[str, float]] = None,
+                 options: None|dict[str, dict[str, Any]] = None) -> dict[str, Log]:
         '''
         Adds logs to nodes in the system.
         
         Args:
             names(tuple[str,...]): tuple of node names to add logs to.
+            sinks(None|dict[str, Sink]): node names (keys) and sinks for their logs (values).
+                None by default, if None, all records are held in memory.
+            summaries(None|dict[str, dict[str, float]]): node names (keys) and thresholds (values)
+                of nodes that only log summary statistics (see SummaryLog).
+                None by default, if None, all records are logged.
+            options(None|dict[str, dict[str, Any]]): node names (keys) and log options (values),
+                for example: {'storage': {'period': 24}}
+                (see Log for decimation and aggregation options).
 
         Returns:
             dict[str, Log]: node names (keys) and node logs (values).
+        Raises:
+            ValueError: if a node has a summary and also a sink or log options
+                (summaries hold no records to write or decimate).
         '''
         logs = {}
         if names is None:
-            names = [node.name for node in flatten_diagram(self.diagram)]
+            names = [node.name for node in self.plan.nodes]
+        sinks, summaries, options = sinks or {}, summaries or {}, options or {}
+        conflicts = sorted(name for name in summaries if name in sinks or name in options)
+        if conflicts:
+            raise ValueError(f'''
+                Nodes {conflicts} have summaries,
+                summary logs can not have sinks or log options.''')
         for name in names:
             node = self.node_by_name(name)
-            log = node.attach_log(Log())
+            if name in summaries:
+                log = node.attach_log(SummaryLog(thresholds=summaries[name]))
+            else:
+                log = node.attach_log(Log(sink=sinks.get(name), **options.get(name, {})))
             logs[name] = log
         return logs
 
-    def simulation(self, time_steps: int, log_nodes: None|tuple[str,...]=None) -> dict[str, Log]:
+    def remove_logs(self, logs: dict[str, Log]) -> None:
+        '''
+        Removes logs from nodes in the system.
+
+        Args:
+            logs(dict[str, Log]): node names (keys) and node logs (values), as returned by add_logs.
+        '''
+        for name, log in logs.items():
+            self.node_by_name(name).detach_log(log)
+
+    def attached_logs(self) -> tuple[tuple[None|Log, bool],...]:
+        '''Return (attached log, enabled) for each node in the system (see hook_logs).'''
+        return tuple((node.log, node.log is None or node.logging) for node in self.plan.nodes)
+
+    def hook_logs(self, attached: tuple[tuple[None|Log, bool],...]) -> None:
+        '''Puts back logs attached to nodes, as returned by attached_logs (without writing).'''
+        for node, (log, enabled) in zip(self.plan.nodes, attached, strict=True):
+            node.hook_log(log, enabled)
+
+    def enable_logs(self, enabled: bool = True, names: None|tuple[str,...] = None) -> None:
+        '''
+        Enables (or disables) logging without removing logs from nodes.
+
+        Args:
+            enabled(bool): True to write node outputs to their logs, False to skip logging.
+            names(None|tuple[str,...]): tuple of node names, None by default (if None, all nodes).
+        '''
+        nodes = self.plan.nodes if names is None else [self.node_by_name(name) for name in names]
+        for node in nodes:
+            node.enable_log(enabled)
+
+    def snapshot(self) -> tuple[tuple[Any,...],...]:
+        '''
+        Return dynamic state of each node in the system (inflow positions, stored volumes, ...).
+
+        Input data is not part of the state, so snapshots are small and never copy it.
+        '''
+        return tuple(node.snapshot() for node in self.plan.nodes)
+
+    def restore(self, state: tuple[tuple[Any,...],...]) -> None:
+        '''Restores dynamic state of each node in the system from a snapshot.'''
+        for node, node_state in zip(self.plan.nodes, state, strict=True):
+            node.restore(node_state)
+
+    def reset(self, initial_storages: None|dict[str, float] = None) -> None:
+        '''
+        Resets all nodes to their state when the system was built, and removes all node logs.
+
+        Args:
+            initial_storages(None|dict[str, float]): storage node names (keys)
+                and initial volumes (values). None by default,
+                if None, storages are reset to their volumes when the system was built.
+        '''
+        for node, state in zip(self.plan.nodes, self.__initial_state, strict=True):
+            node.detach_log()
+            node.restore(state)
+        if initial_storages is not None:
+            for name, storage in initial_storages.items():
+                self.node_by_name(name).reset(storage)
+
+    def simulation(self, time_steps: int, log_nodes: None|tuple[str,...]=None,
+                   engine: Engine = Engine.PLAN,
+                   sinks: None|dict[str, Sink] = None,
+                   memmap: None|str = None,
+                   summaries: None|dict[str, dict[str, float]] = None,
+                   log_options: None|dict[str, dict[str, Any]] = None,
+                   checkpoint: None|str = None,
+                   checkpoint_interval: None|int = None) -> dict[str, Log]:
         '''
         Run the system and return the outflows from the outlet node.
 
+        Long simulations can be checkpointed (see lattice.checkpoint):
+        if the checkpoint file exists, the simulation resumes from it
+        (with the saved logs, sinks resume after their flushed records),
+        and the checkpoint is saved again every checkpoint_interval timesteps and at the end.
+
         Args:
             time_steps(int): number of time steps to run the simulation.
             log_nodes(None|tuple[str,...]): tuple of node names to log.
                 None by default, if None, all nodes are logged.
+            engine(Engine): engine used to run the simulation (see lattice.engine).
+                Engine.PLAN by default.
+            sinks(None|dict[str, Sink]): node names (keys) and sinks for their logs (values).
+                None by default, if None, all records are held in memory.
+                Sinks are closed at the end of the simulation.
+            memmap(None|str): path to a .npy file backing all logs (see lattice.results).
+                None by default, if None, logs are held in memory.
+                Results can be reopened with lattice.results.load_logs.
+            summaries(None|dict[str, dict[str, float]]): node names (keys) and thresholds (values)
+                of nodes that only log summary statistics (see SummaryLog).
+                None by default, if None, all records are logged.
+            log_options(None|dict[str, dict[str, Any]]): node names (keys) and log options (values),
+                for example: {'storage': {'period': 24}} to log daily values of an hourly simulation
+                (see Log for decimation and aggregation options).
+            checkpoint(None|str): path to the checkpoint (.npz) file,
+                None by default (if None, no checkpoints are saved).
+                Resumed simulations keep the saved logs,
+                so log_nodes, summaries and log_options are not used.
+            checkpoint_interval(None|int): number of timesteps between checkpoints,
+                None by default (if None, the checkpoint is only saved at the end).
 
         Returns:
             dict[str, Log]: node names (keys) and node logs (values).
+        Raises:
+            ValueError: if the checkpoint was saved by another system,
+                or by a simulation of more than time_steps timesteps,
+                or if a node has a summary and also a sink or log options (see add_logs).
         '''
-        # set up.
-        system = copy.deepcopy(self)
-        logs = system.add_logs(log_nodes)
-
-        # run simulation.
-        outlet = system.diagram[0][0]
-        for _ in range(time_steps):
-            outlet.send()
+        # the system (node states and attached logs) is restored after the simulation,
+        # even if it fails.
+        state, attached = self.snapshot(), self.attached_logs()
+        logs: dict[str, Log] = {}
+        mapped = False
+        try:
+            steps = 0
+            if checkpoint is not None and os.path.exists(checkpoint):
+                steps = checkpoint_steps(checkpoint)
+                if steps > time_steps:
+                    raise ValueError(f'''
+                        Checkpoint {checkpoint} was saved after {steps} timesteps,
+                        the simulation runs {time_steps} timesteps.''')
+                logs = load_checkpoint(checkpoint, self, sinks)
+            else:
+                logs = self.add_logs(log_nodes, sinks, summaries, log_options)
+            if memmap is not None:
+                rows = max((len(log) for log in logs.values()), default=0) + time_steps - steps
+                map_logs(logs, rows, memmap, ensemble_members(self.plan))
+                mapped = True
+            for log in logs.values():
+                log.reserve(time_steps - steps)
+            interval = ((checkpoint_interval if checkpoint is not None else None)
+                        or max(time_steps - steps, 1))
+            for start in range(steps, time_steps, interval):
+                run(self.plan, min(interval, time_steps - start), logs, engine)
+                if checkpoint is not None:
+                    save_checkpoint(checkpoint, self, logs, min(start + interval, time_steps))
+        finally:
+            self.hook_logs(attached)
+            self.restore(state)
+            for log in logs.values():
+                log.close()
+            if mapped:
+                write_index(logs, memmap)
         return logs
+
+    def iter_simulation(self, time_steps: None|int = None,
+                        nodes: None|tuple[str,...] = None
+                        ) -> Iterator[tuple[float, dict[str, float]]]:
+        '''
+        Run the system one time step at a time, yielding results instead of logging them.
+
+        Results are computed as they are requested,
+        so memory use does not grow with the number of time steps.
+        The system is restored to its starting state when the iteration ends
+        (or the generator is closed).
+
+        Args:
+            time_steps(None|int): number of time steps, None by default
+                (if None, until the consumer stops iterating or inflow data runs out).
+            nodes(None|tuple[str,...]): tuple of node names to report.
+                None by default, if None, all storage nodes are reported.
+
+        Yields:
+            tuple[float, dict[str, float]]: outlet outflow,
+                and node names (keys) and states (values),
+                storage volumes for storage nodes and outflows for other nodes.
+        Raises:
+            ValueError: if inflow nodes hold ensembles (see lattice.engine).
+            IndexError: if time_steps is not None and inflow data runs out before time_steps.
+        '''
+        if ensemble_members(self.plan) is not None:
+            raise ValueError(
+                'Ensemble inflows can only be simulated with the layer engine (see simulation).')
+        if nodes is None:
+            nodes = tuple(node.name for node in self.plan.nodes if node.tag == Tag.STORAGE)
+        # (name, storage node or None, position) for each reported node.
+        reported = tuple((name, node if node.tag == Tag.STORAGE else None, self.node_index(name))
+                         for name, node in ((name, self.node_by_name(name)) for name in nodes))
+        state = self.snapshot()
+        steps = iter_plan(self.plan, time_steps)
+        try:
+            while True:
+                try:
+                    flows = next(steps)
+                except StopIteration:
+                    return
+                except IndexError:
+                    # open ended iterations stop when an inflow node (that does not loop)
+                    # runs out of data.
+                    if time_steps is None:
+                        return
+                    raise
+                yield flows[0], {name: flows[i] if node is None else node.volume
+                                 for name, node, i in reported}
+        finally:
+            self.restore(state)
+
+    def step(self, inflows: dict[str, float]) -> tuple[float, dict[str, float]]:
+        '''
+        Advances the system one time step, using inflows supplied by the caller
+        (for real-time operations).
+
+        Supplied inflows replace the flows sent by their inflow nodes (their data is not read),
+        all other inflow nodes send the next value in their data.
+        Unlike simulation, the system is not restored, so each call continues from the last.
+        The execution order for each set of supplied inflow names is compiled once,
+        on the first call.
+
+        Args:
+            inflows(dict[str, float]): inflow node names (keys)
+                and inflows for the time step (values).
+
+        Returns:
+            tuple[float, dict[str, float]]: outlet outflow,
+                and storage node names (keys) and volumes (values).
+        Raises:
+            ValueError: if a name is not the name of an inflow node in the system,
+                or if inflow nodes hold ensembles (see lattice.engine).
+        '''
+        if ensemble_members(self.plan) is not None:
+            raise ValueError(
+                'Ensemble inflows can only be simulated with the layer engine (see simulation).')
+        key = frozenset(inflows)
+        compiled = self.__steps.get(key)
+        if compiled is None:
+            compiled = self.__compile_step(key)
+        program, supplied, storages = compiled
+        flows = [0.0] * len(self.plan.nodes)
+        for name, i in supplied:
+            flows[i] = inflows[name]
+        advance(program, flows)
+        return flows[0], {name: reservoir.storage for name, reservoir in storages}
+
+    def __compile_step(self, names: frozenset[str]) -> tuple[Any,...]:
+        # (program without supplied inflow nodes, supplied (name, position),
+        #  storage (name, reservoir)).
+        supplied = tuple((name, self.node_index(name)) for name in names)
+        for name, i in supplied:
+            if self.plan.nodes[i].tag != Tag.INFLOW:
+                raise ValueError(
+                    f'Only inflow node inflows can be supplied, {name} is not an inflow node.')
+        positions = {i for _, i in supplied}
+        program = tuple(item for item in compile_program(self.plan) if item[0] not in positions)
+        storages = tuple((node.name, node.reservoir) for node in self.plan.nodes
+                         if node.tag == Tag.STORAGE)
+        self.__steps[names] = (program, supplied, storages)
+        return self.__steps[names]
+
+    def run_many(self, scenarios: list[Scenario], time_steps: int,
+                 log_nodes: None|tuple[str,...] = None, workers: None|int = None,
+                 engine: Engine = Engine.PLAN) -> dict[str, np.ndarray]:
+        '''
+        Run independent simulations of the system in parallel worker processes.
+
+        The system is sent to each worker process once.
+        Each scenario is applied to the worker's system (and undone after its simulation),
+        and its logs are written to shared memory (rather than returned as pickled logs).
+
+        Args:
+            scenarios(list[Scenario]): changes made to the system for each simulation.
+            time_steps(int): number of time steps to run each simulation.
+            log_nodes(None|tuple[str,...]): tuple of node names to log.
+                None by default, if None, all nodes are logged.
+            workers(None|int): number of worker processes.
+                None by default, if None, the number of processors is used.
+            engine(Engine): engine used to run the simulations (see lattice.engine).
+
+        Returns:
+            dict[str, np.ndarray]: node names (keys)
+                and (scenarios, records, fields) arrays (values),
+                or (scenarios, records, members, fields) arrays for ensemble simulations,
+                with the same records and fields as Log.to_array().
+        '''
+        # records and fields for each log (logs attached to the system are left in place).
+        attached = self.attached_logs()
+        try:
+            logs = self.add_logs(log_nodes)
+        finally:
+            self.hook_logs(attached)
+        # ensemble logs have a member axis (see Log.to_array).
+        members = ensemble_members(self.plan)
+        layout, size = {}, 0
+        for name, log in logs.items():
+            rows, fields = len(log) + time_steps, log.fields
+            layout[name] = (size, (rows, fields) if members is None else (rows, members, fields))
+            size += math.prod(layout[name][1])
+        shape = (len(scenarios), size)
+
+        memory = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 8))
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                                     initargs=(self,)) as executor:
+                futures = [executor.submit(_run_scenario, i, scenario, time_steps, log_nodes,
+                                           engine, memory.name, shape, layout)
+                           for i, scenario in enumerate(scenarios)]
+                for future in futures:
+                    future.result()
+            results = np.ndarray(shape, dtype=float, buffer=memory.buf).copy()
+        finally:
+            memory.close()
+            memory.unlink()
+        return {name: results[:, start:start + math.prod(log_shape)].reshape(len(scenarios),
+                                                                          *log_shape)
+                for name, (start, log_shape) in layout.items()}
@@ -0,0 +1,89 @@
+'''Tests checkpoint.py'''
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from lattice.node import Inflow, Storage, Outlet
+from lattice.reservoir import BasicReservoir
+from lattice.engine import Engine, run
+from lattice.system import System
+from lattice.sinks import CSVSink
+from lattice.checkpoint import save_checkpoint, load_checkpoint, checkpoint_steps
+
+def build_system() -> System:
+    '''Return a new system with two storage nodes.'''
+    return System([[Outlet()],
+                   [[Storage(BasicReservoir(2)), Storage(BasicReservoir(1, 0.5))]],
+                   [Inflow([1, 2, 0, 1, 3, 0, 2, 1]), Inflow([0, 1, 1, 2, 0, 0, 1, 3])]])
+
+class TestCheckpoint(unittest.TestCase):
+    '''Tests saving and resuming simulations.'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.path = os.path.join(self.directory.name, 'run.npz')
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_resumed_run_matches_uninterrupted_run(self):
+        '''Test a run resumed from a checkpoint (in a new system) matches an uninterrupted run.'''
+        for engine in Engine:
+            expected = build_system().simulation(8, engine=engine)
+            system = build_system()
+            logs = system.add_logs(None)
+            run(system.plan, 5, logs, engine)
+            save_checkpoint(self.path, system, logs)
+            resumed = build_system()
+            logs = load_checkpoint(self.path, resumed)
+            self.assertEqual(resumed.snapshot(), system.snapshot())
+            run(resumed.plan, 3, logs, engine)
+            for name, log in expected.items():
+                self.assertEqual(logs[name].records, log.records)
+
+    def test_summary_and_decimated_logs(self):
+        '''Test summary statistics and partial aggregation periods are saved.'''
+        def attach(system: System):
+            return system.add_logs(('storage_1', 'outlet'), summaries={'storage_1': {'Storage': 1}},
+                                   options={'outlet': {'period': 3}})
+        system = build_system()
+        expected = attach(system)
+        run(system.plan, 8, expected)
+        system = build_system()
+        logs = attach(system)
+        run(system.plan, 4, logs)
+        save_checkpoint(self.path, system, logs)
+        resumed = build_system()
+        logs = load_checkpoint(self.path, resumed)
+        run(resumed.plan, 4, logs)
+        for name, log in expected.items():
+            log.close()
+            logs[name].close()
+            np.testing.assert_array_equal(logs[name].to_array(), log.to_array())
+        np.testing.assert_allclose(logs['storage_1'].mean, expected['storage_1'].mean)
+        self.assertEqual(logs['storage_1'].below, expected['storage_1'].below)
+
+    def test_different_system_raises_value_error(self):
+        '''Test checkpoints only resume systems with the same nodes.'''
+        save_checkpoint(self.path, build_system())
+        with self.assertRaises(ValueError):
+            load_checkpoint(self.path, System([[Outlet()], [Inflow([1])]]))
+
+    def test_simulation_resumes_from_checkpoint(self):
+        '''Test simulations resume from their checkpoint, sinks are truncated to flushed records.'''
+        expected = build_system().simulation(8)
+        path = os.path.join(self.directory.name, 'storage_1.csv')
+        build_system().simulation(5, sinks={'storage_1': CSVSink(path)},
+                                  log_options={'storage_1': {'chunk': 2}},
+                                  checkpoint=self.path, checkpoint_interval=3)
+        self.assertEqual(checkpoint_steps(self.path), 5)
+        logs = build_system().simulation(8, sinks={'storage_1': CSVSink(path)},
+                                         checkpoint=self.path, checkpoint_interval=3)
+        self.assertEqual(checkpoint_steps(self.path), 8)
+        for name in ('outlet', 'storage_2', 'inflow_1'):
+            self.assertEqual(logs[name].records, expected[name].records)
+        np.testing.assert_array_equal(pd.read_csv(path).to_numpy(),
+                                      expected['storage_1'].to_array())
+        with self.assertRaises(ValueError):
+            build_system().simulation(6, checkpoint=self.path)
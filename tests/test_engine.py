@@ -0,0 +1,116 @@
+'''Tests engine.py'''
+import unittest
+
+import numpy as np
+
+from lattice.node import Inflow, Storage, Outlet, Tag
+from lattice.reservoir import BasicReservoir
+from lattice.engine import Engine, run
+from lattice.system import System
+
+def build_system(capacity: float = 1) -> System:
+    '''Return a new system with the same structure as the complex diagram example.'''
+    return System([
+        [Outlet()],
+        [[Storage(BasicReservoir(capacity)), Storage(BasicReservoir(capacity, 0.5))]],
+        [Inflow([1, 1, 0, 2, 0.5]),
+         [Storage(BasicReservoir(capacity)), Storage(BasicReservoir(2))]],
+        [Inflow([1, 1, 1, 0, 3]), Inflow([0.5, 1, 1.5, 1, 0])]
+    ])
+
+class TestLayerEngine(unittest.TestCase):
+    '''Tests layer engine.'''
+    def test_layer_engine_matches_plan_engine(self):
+        '''Test layer engine logs are the same as plan engine logs.'''
+        plan_logs = build_system().simulation(5, engine=Engine.PLAN)
+        layer_logs = build_system().simulation(5, engine=Engine.LAYER)
+        for name, log in plan_logs.items():
+            self.assertEqual(layer_logs[name].records, log.records)
+
+    def test_layer_engine_updates_nodes(self):
+        '''Test layer engine leaves nodes in the same state as the plan engine.'''
+        plan_system, layer_system = build_system(), build_system()
+        run(plan_system.plan, 4, {}, Engine.PLAN)
+        run(layer_system.plan, 4, {}, Engine.LAYER)
+        for tag, state in ((Tag.STORAGE, lambda node: node.volume),
+                           (Tag.INFLOW, lambda node: node.receive())):
+            self.assertEqual([state(node) for node in plan_system.plan.nodes if node.tag == tag],
+                             [state(node) for node in layer_system.plan.nodes if node.tag == tag])
+
+    def test_layer_engine_runs_in_chunks(self):
+        '''Test layer engine sinks receive blocks of at most the log chunk.'''
+        class BlockSink:
+            '''Sink that keeps the written blocks.'''
+            def __init__(self):
+                self.blocks = []
+            def write(self, block, columns):
+                '''Keeps block.'''
+                self.blocks.append(block.copy())
+            def close(self):
+                '''Nothing to close.'''
+        expected = build_system().simulation(5, engine=Engine.PLAN)
+        sink = BlockSink()
+        logs = build_system().simulation(5, engine=Engine.LAYER, sinks={'outlet': sink},
+                                         log_options={'outlet': {'chunk': 2}})
+        self.assertEqual([len(block) for block in sink.blocks], [2, 2, 1])
+        np.testing.assert_array_equal(np.concatenate(sink.blocks), expected['outlet'].to_array())
+        for name in ('storage_1', 'inflow_1'):
+            self.assertEqual(logs[name].records, expected[name].records)
+
+    def test_non_passive_storage_raises_value_error(self):
+        '''Test layer engine rejects storage with custom operations.'''
+        reservoir = BasicReservoir(operations=lambda reservoir, inflow: (inflow, 0, (inflow,)))
+        system = System([[Outlet()], [Storage(reservoir)], [Inflow([1])]])
+        with self.assertRaises(ValueError):
+            system.simulation(1, engine=Engine.LAYER)
+
+class TestSeriesEngine(unittest.TestCase):
+    '''Tests series engine.'''
+    def test_series_engine_matches_plan_engine(self):
+        '''Test series engine logs are the same as plan engine logs.'''
+        plan_logs = build_system().simulation(5, engine=Engine.PLAN)
+        series_logs = build_system().simulation(5, engine=Engine.SERIES)
+        for name, log in plan_logs.items():
+            self.assertEqual(series_logs[name].records, log.records)
+
+    def test_series_engine_runs_custom_operations(self):
+        '''Test series engine runs storage with custom operations timestep by timestep.'''
+        def release_half(reservoir, inflow):
+            release = (reservoir.storage + inflow) / 2
+            reservoir.storage = release
+            return inflow, reservoir.storage, (release,)
+        def build() -> System:
+            return System([[Outlet()], [Storage(BasicReservoir(operations=release_half))],
+                           [Inflow([1, 2, 3])]])
+        plan_logs = build().simulation(3, engine=Engine.PLAN)
+        series_logs = build().simulation(3, engine=Engine.SERIES)
+        self.assertEqual(series_logs['storage'].records, plan_logs['storage'].records)
+        self.assertEqual(series_logs['outlet'].records, [0.5, 1.25, 2.125])
+
+class TestEnsemble(unittest.TestCase):
+    '''Tests ensemble simulations.'''
+    def test_ensemble_members_match_single_simulations(self):
+        '''Test each ensemble member matches a simulation of its trace.'''
+        traces = np.array([[1, 1, 0], [0, 2, 2], [3, 0, 1]], dtype=float)
+        def build(data) -> System:
+            return System([[Outlet()],
+                           [[Storage(BasicReservoir()), Storage(BasicReservoir(2))]],
+                           [Inflow(data), Inflow([1, 0, 1])]])
+        logs = build(traces).simulation(3, engine=Engine.LAYER)
+        for member, trace in enumerate(traces):
+            member_logs = build(trace.tolist()).simulation(3)
+            for name, log in member_logs.items():
+                np.testing.assert_array_equal(logs[name].to_array()[:, member], log.to_array())
+
+    def test_ensemble_log_shape(self):
+        '''Test ensemble storage logs have a member dimension.'''
+        system = System([[Outlet()], [Storage(BasicReservoir())], [Inflow(np.ones((4, 3)))]])
+        logs = system.simulation(3, engine=Engine.LAYER)
+        self.assertEqual(logs['storage'].to_array().shape, (4, 4, 3))
+        self.assertEqual(logs['outlet'].to_array().shape, (3, 4, 1))
+
+    def test_ensemble_plan_engine_raises_value_error(self):
+        '''Test ensemble inflows are rejected by the plan engine.'''
+        system = System([[Outlet()], [Storage(BasicReservoir())], [Inflow(np.ones((4, 3)))]])
+        with self.assertRaises(ValueError):
+            system.simulation(3, engine=Engine.PLAN)
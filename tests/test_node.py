@@ -1,7 +1,15 @@
 '''Tests node.py'''
+import os
+import pickle
+import tempfile
 import unittest
 
-from lattice.node import Inflow
+import numpy as np
+
+from lattice.node import Inflow, Storage, Outlet, Log, SummaryLog, transfer_flow
+from lattice.reservoir import BasicReservoir
+from lattice.engine import Engine, run
+from lattice.system import System
 
 class TestInflow(unittest.TestCase):
     '''Tests Inflow class.'''
@@ -11,3 +19,226 @@ class TestInflow(unittest.TestCase):
         self.assertEqual(inflow.receive(), 1)
         self.assertEqual(inflow.receive(), 2)
         self.assertEqual(inflow.receive(), 3)
+
+class TestInflowFiles(unittest.TestCase):
+    '''Tests memory-mapped inflow data.'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.data = np.array([[1, 2, 0, 1], [3, 0, 1, 2]], dtype=float)
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_npy_file(self):
+        '''Test npy files are memory-mapped, not loaded.'''
+        path = os.path.join(self.directory.name, 'inflow.npy')
+        np.save(path, self.data[0])
+        inflow = Inflow.from_file(path, name='gauge')
+        self.assertIsInstance(inflow.data, np.memmap)
+        self.assertEqual((inflow.name, inflow.receive()), ('gauge', 1))
+        np.testing.assert_array_equal(inflow.take(3), [2, 0, 1])
+
+    def test_raw_binary_ensemble_file(self):
+        '''Test raw binary float32 files are read as (members x timesteps) ensembles.'''
+        path = os.path.join(self.directory.name, 'inflow.bin')
+        self.data.astype('<f4').tofile(path)
+        inflow = Inflow.from_file(path, dtype='<f4', members=2)
+        self.assertEqual((inflow.members, inflow.length), (2, 4))
+        np.testing.assert_array_equal(inflow.take(4), self.data)
+
+    def test_pickle_memory_mapped_data_by_path(self):
+        '''Test memory-mapped data is mapped again, not copied, when unpickled.'''
+        path = os.path.join(self.directory.name, 'inflow.bin')
+        data = np.arange(10_000, dtype=float)
+        data.tofile(path)
+        inflow = Inflow.from_file(path)
+        self.assertLess(len(pickle.dumps(inflow)), data.nbytes // 10)
+        inflow = pickle.loads(pickle.dumps(inflow))
+        self.assertIsInstance(inflow.data, np.memmap)
+        np.testing.assert_array_equal(inflow.take(10_000), data)
+
+    def test_simulation_matches_list_data(self):
+        '''Test simulations of memory-mapped data match simulations of list data.'''
+        path = os.path.join(self.directory.name, 'inflow.bin')
+        self.data[0].tofile(path)
+        def build(inflow: Inflow) -> System:
+            return System([[Outlet()], [Storage(BasicReservoir(1))], [inflow]])
+        expected = build(Inflow(self.data[0].tolist())).simulation(4)
+        for engine in Engine:
+            logs = build(Inflow.from_file(path)).simulation(4, engine=engine)
+            for name, log in expected.items():
+                self.assertEqual(logs[name].records, log.records)
+
+class TestLog(unittest.TestCase):
+    '''Tests Log class.'''
+    def test_append_nested_records(self):
+        '''Test records are stored in columns and returned nested like the headers.'''
+        log = Log(headers=('Inflow', 'Storage', ('Spill', 'Release')))
+        log.append((1, 2, (3, 4)))
+        log.append((5, 6, (7, 8)))
+        np.testing.assert_array_equal(log.to_array(), [[1, 2, 3, 4], [5, 6, 7, 8]])
+        self.assertEqual(log.records, [(1, 2, (3, 4)), (5, 6, (7, 8))])
+
+    def test_reserve_preallocates_data(self):
+        '''Test records are written in place after reserve.'''
+        log = Log(headers=('Outflow',))
+        log.reserve(10)
+        data = log.data
+        for i in range(10):
+            log.append(i)
+        self.assertIs(log.data, data)
+        self.assertEqual(log.records, list(range(10)))
+
+    def test_appended_records_are_written_to_data(self):
+        '''Test each appended record is written to data as it is appended.'''
+        log = Log(headers=('Inflow', 'Storage', ('Spill', 'Release')))
+        log.reserve(10)
+        for i in range(3):
+            log.append((i, 2 * i, (3 * i, 4 * i)))
+            np.testing.assert_array_equal(log.data[log.size - 1], [i, 2 * i, 3 * i, 4 * i])
+        log = pickle.loads(pickle.dumps(log))
+        log.append((3, 6, (9, 12)))
+        self.assertEqual(log.records, [(i, 2 * i, (3 * i, 4 * i)) for i in range(4)])
+
+    def test_to_dataframe_does_not_copy(self):
+        '''Test dataframe wraps log data.'''
+        log = Log(headers=('Inflow', 'Storage', ('Outflow',)))
+        log.extend(np.arange(12, dtype=float).reshape(4, 3))
+        df = log.to_dataframe()
+        self.assertEqual(list(df.columns), ['Inflow', 'Storage', 'Outflow'])
+        self.assertTrue(np.shares_memory(df.to_numpy(), log.data))
+
+    def test_multiple_outflows_dataframe_columns(self):
+        '''Test storage logs with multiple outflows have one float column per outflow.'''
+        def spill_and_release(reservoir, inflow):
+            release = min(inflow, 1)
+            spill = max(0, reservoir.storage + inflow - release - reservoir.capacity)
+            reservoir.storage += inflow - release - spill
+            return inflow, reservoir.storage, (spill, release)
+        reservoir = BasicReservoir(capacity=2, operations=spill_and_release,
+                                   output_headers=('Inflow', 'Storage', ('Outflow', 'Outflow')))
+        system = System([[Outlet()], [Storage(reservoir)], [Inflow([3, 1, 2])]])
+        df = system.simulation(3)['storage'].to_dataframe()
+        self.assertEqual(list(df.columns), ['Inflow', 'Storage', 'Outflow_0', 'Outflow_1'])
+        self.assertTrue(all(dtype == np.float64 for dtype in df.dtypes))
+        self.assertEqual(df['Outflow_0'].tolist(), [0, 0, 0, 1])
+
+    def test_window_and_stride(self):
+        '''Test decimated logs only keep every stride-th record in the window.'''
+        log = Log(headers=('Outflow',), start=2, stop=9, stride=3)
+        log.extend(np.arange(5, dtype=float)[:, np.newaxis])
+        for i in range(5, 12):
+            log.append(i)
+        self.assertEqual(log.records, [2, 5, 8])
+
+    def test_period_aggregation(self):
+        '''Test decimated logs sum flows and average storage over each period.'''
+        log = Log(headers=('Inflow', 'Storage', ('Outflow',)), period=2,
+                  aggregations={'Inflow': 'max'}, averaged=(1,))
+        log.extend(np.arange(15, dtype=float).reshape(5, 3))
+        log.close()
+        np.testing.assert_array_equal(log.to_array(), [[3, 2.5, 7], [9, 8.5, 19], [12, 13, 14]])
+
+    def test_storage_field_is_averaged_by_position(self):
+        '''Test storage logs average their storage field, whatever its header is named.'''
+        reservoir = BasicReservoir(capacity=2, output_headers=('In', 'Volume', ('Out',)))
+        system = System([[Outlet()], [Storage(reservoir)], [Inflow([1, 2, 0, 1])]])
+        logs = system.simulation(4, log_options={'storage': {'period': 2}})
+        np.testing.assert_array_equal(logs['storage'].to_array()[1:], [[3, 1.5, 1], [1, 2, 1]])
+
+    def test_simulation_log_options(self):
+        '''Test simulations log aggregated records with log options.'''
+        system = System([[Outlet()], [Storage(BasicReservoir(2))], [Inflow([1, 2, 0, 1, 3])]])
+        logs = system.simulation(5, log_options={'outlet': {'period': 2}})
+        self.assertEqual(logs['outlet'].records, [1, 1, 3])
+        self.assertEqual(len(logs['storage']), 6)
+
+    def test_initial_state_is_not_decimated(self):
+        '''Test storage log periods cover the same timesteps as other logs, after initial state.'''
+        system = System([[Outlet()], [Storage(BasicReservoir(2))], [Inflow([1, 2, 3, 4, 5, 6])]])
+        options = {name: {'period': 2} for name in ('inflow', 'storage', 'outlet')}
+        logs = system.simulation(6, log_options=options)
+        storage = logs['storage'].to_array()
+        np.testing.assert_array_equal(storage[0], [0, 0, 0])
+        np.testing.assert_array_equal(storage[1:, 0], logs['inflow'].to_array()[:, 0])
+        np.testing.assert_array_equal(storage[1:, 2], logs['outlet'].to_array()[:, 0])
+
+class TestLogHook(unittest.TestCase):
+    '''Tests attaching, detaching and disabling node logs.'''
+    def test_attach_log_replaces_log(self):
+        '''Test repeated attachments replace the attached log rather than stacking loggers.'''
+        system = System([[Outlet()], [Storage(BasicReservoir())], [Inflow([1, 1, 0])]])
+        first = system.add_logs(None)
+        second = system.add_logs(None)
+        run(system.plan, 3, second)
+        inflow = system.node_by_name('inflow')
+        self.assertIs(inflow.operations.__wrapped__, transfer_flow)
+        self.assertEqual(len(first['outlet']), 0)
+        self.assertEqual(second['outlet'].records, [0, 1, 0])
+
+    def test_disabled_logs_are_bypassed(self):
+        '''Test disabled logs are not filled, and operations are not wrapped.'''
+        for engine in Engine:
+            system = System([[Outlet()], [Storage(BasicReservoir())], [Inflow([1, 1, 0])]])
+            logs = system.add_logs(None)
+            system.enable_logs(False, ('inflow', 'outlet'))
+            self.assertIs(system.node_by_name('inflow').operations, transfer_flow)
+            run(system.plan, 3, logs, engine)
+            self.assertEqual([len(logs[name]) for name in ('inflow', 'outlet', 'storage')],
+                             [0, 0, 4])
+            system.enable_logs()
+            self.assertTrue(system.node_by_name('outlet').logging)
+
+class TestPickle(unittest.TestCase):
+    '''Tests pickling nodes and logs.'''
+    def test_pickle_logged_system(self):
+        '''Test logged system can be pickled and keeps logging.'''
+        system = System([[Outlet()], [Storage(BasicReservoir())], [Inflow([1, 1, 0])]])
+        logs = system.add_logs(None)
+        system, logs = pickle.loads(pickle.dumps((system, logs)))
+        run(system.plan, 3, logs)
+        self.assertEqual(logs['outlet'].records, [0, 1, 0])
+        self.assertEqual(logs['storage'].records[-1], (0, 1, (0,)))
+
+    def test_pickle_inflow_data_out_of_band(self):
+        '''Test inflow data is pickled as a single out-of-band buffer.'''
+        buffers = []
+        data = pickle.dumps(Inflow([1.0] * 1000), protocol=5, buffer_callback=buffers.append)
+        self.assertEqual(len(buffers), 1)
+        inflow = pickle.loads(data, buffers=buffers)
+        self.assertEqual(inflow.receive(), 1)
+
+class TestSummaryLog(unittest.TestCase):
+    '''Tests SummaryLog class.'''
+    def test_summary_matches_full_log(self):
+        '''Test summary statistics match statistics of the full log.'''
+        def build() -> System:
+            return System([[Outlet()], [Storage(BasicReservoir(2))],
+                           [Inflow([1, 2, 0, 1, 3, 0.5])]])
+        # the initial state (record 0 of the full log) is not summarized.
+        full = build().simulation(6)['storage'].to_array()[1:]
+        summary = build().simulation(6, summaries={'storage': {'Storage': 1.5}})['storage']
+        self.assertEqual(summary.count, 6)
+        self.assertEqual(len(summary.data), 0)
+        np.testing.assert_allclose(summary.mean, full.mean(axis=0))
+        np.testing.assert_allclose(summary.variance, full.var(axis=0))
+        np.testing.assert_array_equal(summary.minimum, full.min(axis=0))
+        np.testing.assert_array_equal(summary.maximum, full.max(axis=0))
+        self.assertEqual(summary.below['Storage'], (full[:, 1] < 1.5).sum())
+
+    def test_summary_with_options_raises_value_error(self):
+        '''Test summary logs can not have log options or sinks.'''
+        system = System([[Outlet()], [Storage(BasicReservoir(2))], [Inflow([1, 2, 0])]])
+        with self.assertRaises(ValueError):
+            system.simulation(3, summaries={'storage': {}}, log_options={'storage': {'period': 2}})
+        self.assertTrue(all(node.log is None for node in system.plan.nodes))
+
+    def test_summary_of_blocks(self):
+        '''Test summary statistics of blocks of records.'''
+        values = np.arange(20, dtype=float).reshape(10, 2) ** 1.5
+        log = SummaryLog(headers=('Inflow', 'Outflow'))
+        log.append(tuple(values[0]))
+        log.extend(values[1:6])
+        log.extend(values[6:])
+        df = log.summary()
+        np.testing.assert_allclose(df['mean'], values.mean(axis=0))
+        np.testing.assert_allclose(df['variance'], values.var(axis=0))
@@ -0,0 +1,51 @@
+'''Tests plan.py'''
+import unittest
+
+from lattice.node import Inflow, Storage, Outlet
+from lattice.reservoir import BasicReservoir
+from lattice.plan import compile_plan, run_plan
+from lattice.system import System
+
+from examples.diagrams import simple_diagram, complex_diagram
+
+class TestCompilePlan(unittest.TestCase):
+    '''Tests compile plan function.'''
+    def test_simple_diagram_plan(self):
+        '''Test compile plan simple diagram.'''
+        plan = System(simple_diagram).plan
+        self.assertEqual(plan.order, (2, 1, 0))
+        self.assertEqual(plan.offsets, (0, 1, 2, 2))
+        self.assertEqual(plan.senders, (1, 2))
+        self.assertEqual(plan.receivers, (-1, 0, 1))
+        self.assertEqual(plan.layers, (0, 1, 2, 3))
+
+    def test_complex_diagram_receivers(self):
+        '''Test compile plan complex diagram.'''
+        plan = System(complex_diagram).plan
+        # outlet, storage_1, storage_2, inflow_1, storage_3, storage_4, inflow_2, inflow_3
+        self.assertEqual(plan.receivers, (-1, 0, 0, 1, 2, 2, 4, 5))
+        self.assertEqual(set(plan.senders_of(2)), {4, 5})
+        self.assertEqual(plan.layers, (0, 1, 3, 6, 8))
+
+    def test_sender_outside_diagram_raises_value_error(self):
+        '''Test compile plan unknown sender.'''
+        outlet = Outlet(senders={Inflow([1])})
+        with self.assertRaises(ValueError):
+            compile_plan([[outlet]])
+
+class TestRunPlan(unittest.TestCase):
+    '''Tests run plan function.'''
+    def test_run_plan_matches_recursive_send(self):
+        '''Test run plan gives the same results as outlet send.'''
+        def build() -> System:
+            return System([[Outlet()],
+                           [[Storage(BasicReservoir()), Storage(BasicReservoir())]],
+                           [Inflow([1, 2, 0, 3]), Inflow([0, 2, 1, 1])]])
+        recursive, compiled = build(), build()
+        recursive_logs = recursive.add_logs(None)
+        compiled_logs = compiled.add_logs(None)
+        for _ in range(4):
+            recursive.diagram[0][0].send()
+        run_plan(compiled.plan, 4)
+        for name, log in recursive_logs.items():
+            self.assertEqual(compiled_logs[name].records, log.records)
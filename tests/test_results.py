@@ -0,0 +1,56 @@
+'''Tests results.py'''
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from lattice.node import Inflow, Storage, Outlet
+from lattice.engine import Engine
+from lattice.reservoir import BasicReservoir
+from lattice.results import load_logs
+from lattice.system import System
+
+def build_system() -> System:
+    '''Return a new simple system.'''
+    return System([[Outlet()], [Storage(BasicReservoir(2))], [Inflow([1, 2, 0, 1, 3])]])
+
+class TestMemoryMappedResults(unittest.TestCase):
+    '''Tests memory-mapped simulation results.'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.path = os.path.join(self.directory.name, 'results.npy')
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_simulation_logs_are_memory_mapped(self):
+        '''Test simulation logs are views of the results file.'''
+        expected = build_system().simulation(5)
+        logs = build_system().simulation(5, memmap=self.path)
+        self.assertEqual(np.load(self.path, mmap_mode='r').shape, (3, 6, 3))
+        for name, log in expected.items():
+            self.assertIsInstance(logs[name].data.base, np.memmap)
+            np.testing.assert_array_equal(logs[name].to_array(), log.to_array())
+
+    def test_load_logs(self):
+        '''Test results can be reopened from disk.'''
+        expected = build_system().simulation(5)
+        build_system().simulation(5, memmap=self.path)
+        logs = load_logs(self.path)
+        self.assertEqual(list(logs), ['outlet', 'storage', 'inflow'])
+        for name, log in expected.items():
+            self.assertEqual(logs[name].records, log.records)
+        self.assertEqual(list(logs['storage'].to_dataframe().columns),
+                         ['Inflow', 'Storage', 'Outflow'])
+
+    def test_ensemble_logs_are_memory_mapped(self):
+        '''Test ensemble logs are (records, members, fields) views of the results file.'''
+        def build() -> System:
+            return System([[Outlet()], [Storage(BasicReservoir(2))],
+                           [Inflow(np.array([[1, 2, 0, 1, 3], [3, 0, 1, 2, 2]], dtype=float))]])
+        expected = build().simulation(5, engine=Engine.LAYER)
+        logs = build().simulation(5, engine=Engine.LAYER, memmap=self.path)
+        self.assertEqual(np.load(self.path, mmap_mode='r').shape, (3, 6, 2, 3))
+        for name, log in expected.items():
+            self.assertIsInstance(logs[name].data.base, np.memmap)
+            np.testing.assert_array_equal(load_logs(self.path)[name].to_array(), log.to_array())
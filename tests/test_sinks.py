@@ -0,0 +1,80 @@
+'''Tests sinks.py'''
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from lattice.node import Inflow, Storage, Outlet, Log
+from lattice.reservoir import BasicReservoir
+from lattice.sinks import CSVSink, NpySink, ParquetSink, pq
+from lattice.system import System
+
+def build_system() -> System:
+    '''Return a new simple system.'''
+    return System([[Outlet()], [Storage(BasicReservoir(2))], [Inflow([1, 2, 0, 1, 3])]])
+
+class TestSinks(unittest.TestCase):
+    '''Tests streaming logs to sinks.'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.expected = build_system().simulation(5)
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_log_holds_chunk_records(self):
+        '''Test logs with sinks flush records when the chunk is full.'''
+        path = os.path.join(self.directory.name, 'outlet.npy')
+        log = Log(headers=('Outflow',), sink=NpySink(path), chunk=2)
+        for i in range(5):
+            log.append(i)
+            self.assertLessEqual(len(log.data), 2)
+        self.assertEqual((log.flushed, log.size), (4, 1))
+        log.close()
+        np.testing.assert_array_equal(np.load(path), [[0], [1], [2], [3], [4]])
+
+    def test_csv_sink(self):
+        '''Test csv sink holds all simulation records.'''
+        path = os.path.join(self.directory.name, 'storage.csv')
+        build_system().simulation(5, sinks={'storage': CSVSink(path)})
+        pd.testing.assert_frame_equal(pd.read_csv(path, dtype=float),
+                                      self.expected['storage'].to_dataframe())
+
+    def test_npy_sink(self):
+        '''Test npy sink holds all simulation records.'''
+        path = os.path.join(self.directory.name, 'storage.npy')
+        sink = NpySink(path)
+        logs = build_system().simulation(5, sinks={'storage': sink})
+        self.assertEqual(logs['storage'].flushed, 6)
+        np.testing.assert_array_equal(np.load(path), self.expected['storage'].to_array())
+
+    @unittest.skipIf(pq is None, 'pyarrow not installed')
+    def test_parquet_sink(self):
+        '''Test parquet sink holds all simulation records.'''
+        path = os.path.join(self.directory.name, 'storage.parquet')
+        build_system().simulation(5, sinks={'storage': ParquetSink(path)})
+        pd.testing.assert_frame_equal(pd.read_parquet(path),
+                                      self.expected['storage'].to_dataframe())
+
+    def test_resume_discards_later_records(self):
+        '''Test resumed sinks keep the first records and append after them.'''
+        block = np.arange(10, dtype=float).reshape(5, 2)
+        sinks = [CSVSink(os.path.join(self.directory.name, 'log.csv')),
+                 NpySink(os.path.join(self.directory.name, 'log.npy'))]
+        if pq is not None:
+            sinks.append(ParquetSink(os.path.join(self.directory.name, 'log.parquet')))
+        for sink in sinks:
+            sink.write(block, ('Inflow', 'Outflow'))
+            sink.close()
+            sink.resume(3)
+            sink.write(block[:2] + 10, ('Inflow', 'Outflow'))
+            sink.close()
+            if isinstance(sink, NpySink):
+                values = np.load(sink.path)
+            else:
+                values = (pd.read_csv(sink.path) if isinstance(sink, CSVSink)
+                          else pd.read_parquet(sink.path)).to_numpy()
+            np.testing.assert_array_equal(values, np.concatenate((block[:3], block[:2] + 10)))
+            with self.assertRaises(ValueError):
+                sink.resume(6)
@@ -0,0 +1,183 @@
+'''Tests sources.py'''
+import os
+import pickle
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from lattice.node import Inflow, Storage, Outlet, inflows_from_table
+from lattice.reservoir import BasicReservoir
+from lattice.sources import TextSource, TransformedSource, read_table
+from lattice.engine import Engine
+from lattice.system import System, Scenario
+
+class TestTextSource(unittest.TestCase):
+    '''Tests reading text files in chunks.'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.path = os.path.join(self.directory.name, 'inflows.csv')
+        self.values = np.arange(10, dtype=float) / 2
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('date,gauge\n')
+            file.writelines(f'{i},{value}\n' for i, value in enumerate(self.values))
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_index_and_slice(self):
+        '''Test values are read by index and by slice across chunks.'''
+        source = TextSource(self.path, 'gauge', chunk=3)
+        self.assertEqual(len(source), 10)
+        self.assertEqual([source[i] for i in (0, 7, 4, -1)], [0, 3.5, 2, 4.5])
+        np.testing.assert_array_equal(source[2:8], self.values[2:8])
+        np.testing.assert_array_equal(np.asarray(source), self.values)
+        with self.assertRaises(IndexError):
+            source[10] # pylint: disable=pointless-statement
+
+    def test_holds_one_chunk(self):
+        '''Test only the current chunk is parsed, so reading starts before the length is known.'''
+        source = TextSource(self.path, 1, chunk=4)
+        self.assertEqual(source[5], 2.5)
+        self.assertEqual(len(source._TextSource__values), 4) # pylint: disable=protected-access
+        self.assertIsNone(source._TextSource__length) # pylint: disable=protected-access
+        source = pickle.loads(pickle.dumps(source))
+        self.assertEqual(source[9], 4.5)
+
+    def test_rows_multiple_of_chunk(self):
+        '''Test reading past the last chunk of a file (rows a multiple of chunk) does not warn.'''
+        source = TextSource(self.path, 'gauge', chunk=5)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            with self.assertRaises(IndexError):
+                source[10] # pylint: disable=pointless-statement
+            np.testing.assert_array_equal(source[5:], self.values[5:])
+
+    def test_unknown_column_raises_value_error(self):
+        '''Test column names must be in the header.'''
+        with self.assertRaises(ValueError):
+            TextSource(self.path, 'flow')
+
+    def test_simulation_matches_list_data(self):
+        '''Test simulations of text data match simulations of list data.'''
+        def build(inflow: Inflow) -> System:
+            return System([[Outlet()], [Storage(BasicReservoir(1))], [inflow]])
+        expected = build(Inflow(self.values.tolist())).simulation(10)
+        for engine in Engine:
+            inflow = Inflow.from_text(self.path, 'gauge', chunk=3)
+            logs = build(inflow).simulation(10, engine=engine)
+            for name, log in expected.items():
+                self.assertEqual(logs[name].records, log.records)
+
+    def test_rows_are_not_counted(self):
+        '''Test taking and iterating text data does not read the whole file to count its rows.'''
+        inflow = Inflow.from_text(self.path, 'gauge', chunk=3)
+        np.testing.assert_array_equal(inflow.take(4), self.values[:4])
+        with self.assertRaises(IndexError):
+            inflow.take(7)
+        system = System([[Outlet()], [Storage(BasicReservoir(1))], [inflow]])
+        iterator = system.iter_simulation(nodes=('inflow',))
+        self.assertEqual(next(iterator)[1]['inflow'], self.values[4])
+        self.assertIsNone(inflow.data._TextSource__length) # pylint: disable=protected-access
+        self.assertEqual(len(list(iterator)), 5)
+
+class TestReadTable(unittest.TestCase):
+    '''Tests reading wide inflow tables.'''
+    def setUp(self):
+        self.table = pd.DataFrame({'a': [1., 2., 3.], 'b': [0., 1., 0.], 'c': [2., 2., 2.]})
+
+    def test_columns_are_contiguous_rows(self):
+        '''Test each column is a contiguous row of one array.'''
+        names, data = read_table(self.table, ('c', 'a'))
+        self.assertEqual(names, ('c', 'a'))
+        self.assertTrue(data.flags.c_contiguous)
+        np.testing.assert_array_equal(data, [[2, 2, 2], [1, 2, 3]])
+
+    def test_csv_and_npy_tables(self):
+        '''Test csv and npy tables are read like DataFrames.'''
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'inflows.csv')
+            self.table.to_csv(path, index=False)
+            np.testing.assert_array_equal(read_table(path)[1], self.table.to_numpy().T)
+            path = os.path.join(directory, 'inflows.npy')
+            np.save(path, self.table.to_numpy())
+            self.assertEqual(read_table(path)[0], ('0', '1', '2'))
+
+    def test_missing_column_raises_value_error(self):
+        '''Test names must be table columns.'''
+        with self.assertRaises(ValueError):
+            read_table(self.table, ('d',))
+
+    def test_inflows_share_one_array(self):
+        '''Test inflow nodes hold views of one array.'''
+        inflows = inflows_from_table(self.table)
+        self.assertEqual(list(inflows), ['a', 'b', 'c'])
+        self.assertIs(inflows['a'].data.base, inflows['c'].data.base)
+        self.assertEqual(inflows['b'].name, 'b')
+        self.assertEqual(inflows['c'].take(3).tolist(), [2, 2, 2])
+
+    def test_inflows_from_csv_with_index(self):
+        '''Test read_csv arguments (read_kwargs) and Inflow arguments are passed separately.'''
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'inflows.csv')
+            self.table.set_index(pd.Index(['x', 'y', 'z'], name='date')).to_csv(path)
+            inflows = inflows_from_table(path, read_kwargs={'index_col': 'date'}, loop=True)
+        self.assertEqual(list(inflows), ['a', 'b', 'c'])
+        self.assertEqual(inflows['a'].take(4).tolist(), [1, 2, 3, 1])
+
+    def test_scenario_from_table(self):
+        '''Test table scenarios replace inflow data matched by node name.'''
+        system = System([[Outlet()],
+                         [[Storage(BasicReservoir(), name='s'), Inflow([0, 0, 0], name='b')]],
+                         [Inflow([0, 0, 0], name='a')]])
+        Scenario.from_table(self.table, ('a', 'b')).apply(system)
+        self.assertEqual(system.simulation(3)['outlet'].records, [0, 3, 3])
+
+class TestTransformedSource(unittest.TestCase):
+    '''Tests lazy transformed views of inflow data.'''
+    def test_values_are_transformed_when_read(self):
+        '''Test values are scaled, shifted and clipped without copying the data.'''
+        data = np.array([1., 2., 3., 4.])
+        source = TransformedSource(data, scale=2, shift=-1, upper=6)
+        self.assertTrue(np.shares_memory(source.data, data))
+        self.assertFalse(source.data.flags.writeable)
+        self.assertEqual([source[i] for i in range(4)], [1, 3, 5, 6])
+        np.testing.assert_array_equal(Inflow(source).take(4), [1, 3, 5, 6])
+
+    def test_float32_memory_mapped_data_is_not_copied(self):
+        '''Test arrays keep their dtype, values are converted to float as they are read.'''
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'inflow.bin')
+            np.arange(4, dtype='<f4').tofile(path)
+            inflow = Inflow.from_file(path, dtype='<f4')
+            source = TransformedSource(inflow.data, scale=0.5)
+            self.assertTrue(np.shares_memory(source.data, inflow.data))
+            self.assertEqual(source.data.dtype, np.float32)
+            self.assertEqual(source[3], 1.5)
+            np.testing.assert_array_equal(Inflow(source).take(4), [0, 0.5, 1, 1.5])
+
+    def test_ensemble_data(self):
+        '''Test transformed ensembles keep their member dimension.'''
+        inflow = Inflow(TransformedSource(np.ones((3, 2)), lower=2))
+        self.assertEqual((inflow.members, inflow.length), (3, 2))
+        np.testing.assert_array_equal(inflow.take(2), np.full((3, 2), 2))
+
+    def test_scenario_transforms(self):
+        '''Test scenario transforms are views of the node data, undone after the scenario.'''
+        data = np.array([1., 2., 0.])
+        system = System([[Outlet()], [Inflow(data)]])
+        undo = Scenario(transforms={'inflow': {'scale': 0.5}}).apply(system)
+        self.assertIs(system.node_by_name('inflow').data.data.base, data)
+        self.assertEqual(system.simulation(3)['outlet'].records, [0.5, 1, 0])
+        undo.apply(system)
+        self.assertIs(system.node_by_name('inflow').data, data)
+
+    def test_list_data_is_not_copied(self):
+        '''Test list data is converted once, so scenario transforms of it are views.'''
+        system = System([[Outlet()], [Inflow([1, 2, 0])]])
+        data = system.node_by_name('inflow').data
+        self.assertFalse(data.flags.writeable)
+        Scenario(transforms={'inflow': {'scale': 2}}).apply(system)
+        self.assertTrue(np.shares_memory(system.node_by_name('inflow').data.data, data))
+        self.assertEqual(system.simulation(3)['outlet'].records, [2, 4, 0])
@@ -0,0 +1,61 @@
+'''Tests synthetic.py'''
+import unittest
+
+import numpy as np
+
+from lattice.node import Inflow, Storage, Outlet
+from lattice.reservoir import BasicReservoir
+from lattice.engine import Engine
+from lattice.system import System
+from lattice.synthetic import streams, fit_thomas_fiering, thomas_fiering, block_bootstrap
+
+def seasonal_history(years: int = 200) -> np.ndarray:
+    '''Return monthly record with a seasonal mean and lag-1 correlation.'''
+    rng = np.random.default_rng(0)
+    noise = np.zeros(12 * years)
+    for t in range(1, len(noise)):
+        noise[t] = 0.6 * noise[t - 1] + 0.8 * rng.standard_normal()
+    return 10 + 5 * np.sin(2 * np.pi * np.arange(12 * years) / 12) + noise
+
+class TestThomasFiering(unittest.TestCase):
+    '''Tests seasonal lag-1 autoregressive traces.'''
+    def test_traces_have_history_statistics(self):
+        '''Test traces have the seasonal means, deviations and correlations of the record.'''
+        history = seasonal_history()
+        traces = thomas_fiering(history, 100, 12 * 50, rng=1)
+        self.assertEqual(traces.shape, (100, 600))
+        expected = fit_thomas_fiering(history)
+        for actual, target in zip(fit_thomas_fiering(traces[0]), expected):
+            np.testing.assert_allclose(actual, target, atol=0.3)
+        np.testing.assert_allclose(traces.reshape(-1, 12).mean(axis=0), expected[0], atol=0.1)
+
+    def test_streams_are_reproducible_and_independent(self):
+        '''Test streams from the same seed give the same traces, and different streams differ.'''
+        history = seasonal_history(10)
+        first, second = streams(7, 2)
+        traces = thomas_fiering(history, 5, 24, rng=first)
+        np.testing.assert_array_equal(traces, thomas_fiering(history, 5, 24, rng=streams(7, 2)[0]))
+        self.assertFalse(np.allclose(traces, thomas_fiering(history, 5, 24, rng=second)))
+
+    def test_short_history_raises_value_error(self):
+        '''Test records need two values per season.'''
+        with self.assertRaises(ValueError):
+            fit_thomas_fiering(np.ones(12))
+
+class TestBlockBootstrap(unittest.TestCase):
+    '''Tests block bootstrap traces.'''
+    def test_blocks_are_seasonal_history_blocks(self):
+        '''Test each block is a block of the record starting in the first season.'''
+        history = np.arange(120, dtype=float)
+        traces = block_bootstrap(history, 4, 30, block=12, rng=3)
+        self.assertEqual(traces.shape, (4, 30))
+        starts = traces[:, ::12]
+        self.assertTrue(np.all(starts % 12 == 0))
+        np.testing.assert_array_equal(np.diff(traces[:, :12]), 1)
+
+    def test_traces_are_ensemble_inflows(self):
+        '''Test traces can be simulated as ensemble inflow data.'''
+        traces = block_bootstrap(np.arange(24, dtype=float), 3, 12, rng=0)
+        system = System([[Outlet()], [Storage(BasicReservoir(5))], [Inflow(traces)]])
+        logs = system.simulation(12, engine=Engine.LAYER)
+        self.assertEqual(logs['outlet'].to_array().shape, (12, 3, 1))
@@ -2,10 +2,14 @@
 
 import unittest
 
+import numpy as np
+
 from lattice.node import Inflow, Storage, Outlet
+from lattice.reservoir import BasicReservoir
+from lattice.engine import Engine, run
 from lattice.system import (process_middle_layer, process_outlet_layer,
                             flatten_layer, flatten_diagram, link_layers,
-                            System)
+                            System, Scenario)
 
 # from lattice.system import (process_middle_layer, process_outlet_layer,
 #                              flatten_layer, link_layers)
@@ -163,3 +167,173 @@ class TestSystem(unittest.TestCase):
                          [(0, 0, (0,)), (1, 1, (0,)), (1, 1, (1,)), (1, 1, (1,))])
         self.assertEqual(logs['inflow_2'].records, [1, 1, 1])
         self.assertEqual(logs['inflow_3'].records, [1, 1, 1])
+
+class TestRunMany(unittest.TestCase):
+    '''Tests system run many method.'''
+    def test_run_many_matches_simulation(self):
+        '''Test each scenario matches a simulation of the modified system.'''
+        def build() -> System:
+            return System([[Outlet()], [Storage(BasicReservoir(2))], [Inflow([1, 1, 0, 2])]])
+        scenarios = [Scenario(),
+                     Scenario(inflows={'inflow': [2, 2, 2, 2]}),
+                     Scenario(capacities={'storage': 1}, storages={'storage': 1})]
+        results = build().run_many(scenarios, 4, workers=2)
+        self.assertEqual(results['storage'].shape, (3, 5, 3))
+        for i, scenario in enumerate(scenarios):
+            system = build()
+            scenario.apply(system)
+            logs = system.simulation(4)
+            for name, log in logs.items():
+                np.testing.assert_array_equal(results[name][i], log.to_array())
+
+    def test_run_many_ensembles(self):
+        '''Test ensemble results have a member axis, and match an ensemble simulation.'''
+        def build() -> System:
+            inflow = Inflow([[1, 1, 0, 2], [0, 2, 1, 1], [3, 0, 0, 1]])
+            return System([[Outlet()], [Storage(BasicReservoir(2))], [inflow]])
+        results = build().run_many([Scenario(), Scenario()], 4, workers=1, engine=Engine.LAYER)
+        self.assertEqual(results['storage'].shape, (2, 5, 3, 3))
+        logs = build().simulation(4, engine=Engine.LAYER)
+        for name, log in logs.items():
+            np.testing.assert_array_equal(results[name][1], log.to_array())
+
+class TestSnapshot(unittest.TestCase):
+    '''Tests system snapshot and restore.'''
+    def test_simulation_restores_system(self):
+        '''Test simulation leaves node state and operations unchanged.'''
+        system = System([[Outlet()], [Storage(BasicReservoir(2, 1))], [Inflow([1, 2, 0])]])
+        data = system.node_by_name('inflow').data
+        state = system.snapshot()
+        first = system.simulation(3)
+        self.assertEqual(system.snapshot(), state)
+        self.assertIs(system.node_by_name('inflow').data, data)
+        second = system.simulation(3)
+        for name, log in first.items():
+            self.assertEqual(second[name].records, log.records)
+
+    def test_restore_snapshot(self):
+        '''Test restore returns nodes to the snapshot state.'''
+        system = System([[Outlet()], [Storage(BasicReservoir(2))], [Inflow([1, 1, 1])]])
+        state = system.snapshot()
+        system.diagram[0][0].send()
+        self.assertEqual(system.snapshot(), ((), (1,), (0,)))
+        system.restore(state)
+        self.assertEqual(system.snapshot(), ((), (0,), (-1,)))
+
+    def test_failed_simulation_removes_logs(self):
+        '''Test simulations that fail during set up leave no logs attached.'''
+        system = System([[Outlet()], [Storage(BasicReservoir(2))], [Inflow([1, 1, 1])]])
+        with self.assertRaises(ValueError):
+            system.simulation(3, log_nodes=('outlet', 'missing'))
+        self.assertTrue(all(node.log is None for node in system.plan.nodes))
+
+    def test_simulation_keeps_attached_logs(self):
+        '''Test logs attached before a simulation are attached (and unchanged) after it.'''
+        system = System([[Outlet()], [Storage(BasicReservoir(2))], [Inflow([1, 1, 1])]])
+        logs = system.add_logs(None)
+        system.enable_logs(False, ('inflow',))
+        system.simulation(3)
+        system.run_many([Scenario()], 3, workers=1)
+        self.assertTrue(all(node.log is logs[node.name] for node in system.plan.nodes))
+        self.assertEqual([len(log) for log in logs.values()], [0, 1, 0])
+        self.assertFalse(system.node_by_name('inflow').logging)
+        run(system.plan, 3, logs)
+        self.assertEqual(logs['outlet'].records, [0, 0, 1])
+
+    def test_reset_rewinds_nodes_and_removes_logs(self):
+        '''Test reset returns nodes to their initial state without logs.'''
+        system = System([[Outlet()], [Storage(BasicReservoir(2, 1))],
+                         [Inflow([1, 1, 1], starting_position=1)]])
+        logs = system.add_logs(None)
+        run(system.plan, 2, logs)
+        system.reset()
+        self.assertEqual(system.snapshot(), ((), (1,), (0,)))
+        run(system.plan, 1, {})
+        self.assertEqual(len(logs['outlet'].records), 2)
+        system.reset({'storage': 0})
+        self.assertEqual(system.node_by_name('storage').volume, 0)
+
+class TestNodeNames(unittest.TestCase):
+    '''Tests system node names.'''
+    def test_format_node_names_skips_taken_suffixes(self):
+        '''Test format node names with names that match generated names.'''
+        system = System([[Outlet()],
+                         [[Storage(BasicReservoir()), Storage(BasicReservoir(), name='storage_2'),
+                           Storage(BasicReservoir()), Storage(BasicReservoir(), name='storage_2')]],
+                         [Inflow([1]), Inflow([1]), Inflow([1]), Inflow([1])]])
+        names = [node.name for node in system.plan.nodes[1:5]]
+        self.assertEqual(names, ['storage_1', 'storage_2_1', 'storage_3', 'storage_2_2'])
+
+    def test_node_index(self):
+        '''Test node index is the node position in the system plan.'''
+        system = System([[Outlet()], [Storage(BasicReservoir())], [Inflow([1])]])
+        self.assertEqual(system.node_index('inflow'), 2)
+        self.assertIs(system.node_by_name('storage'), system.plan.nodes[1])
+
+    def test_renamed_node_found(self):
+        '''Test index is rebuilt after a node is renamed.'''
+        system = System([[Outlet()], [Storage(BasicReservoir())], [Inflow([1])]])
+        system.plan.nodes[1].name = 'reservoir'
+        self.assertIs(system.node_by_name('reservoir'), system.plan.nodes[1])
+        with self.assertRaises(ValueError):
+            system.node_by_name('storage')
+
+class TestIterSimulation(unittest.TestCase):
+    '''Tests iter_simulation method.'''
+    def build(self) -> System:
+        '''Return a new simple system.'''
+        return System([[Outlet()], [Storage(BasicReservoir(2))], [Inflow([1, 2, 0, 1, 3])]])
+
+    def test_results_match_simulation(self):
+        '''Test yielded results match simulation logs, and the system is restored.'''
+        system = self.build()
+        logs = system.simulation(5)
+        state = system.snapshot()
+        results = list(system.iter_simulation(5, ('storage', 'inflow')))
+        self.assertEqual([outflow for outflow, _ in results], logs['outlet'].records)
+        self.assertEqual([states['storage'] for _, states in results],
+                         [record[1] for record in logs['storage'].records[1:]])
+        self.assertEqual([states['inflow'] for _, states in results], [1, 2, 0, 1, 3])
+        self.assertEqual(system.snapshot(), state)
+
+    def test_open_ended_iteration(self):
+        '''Test iteration without time steps runs until the consumer stops.'''
+        system = self.build()
+        iterator = system.iter_simulation()
+        self.assertEqual([next(iterator)[1]['storage'] for _ in range(3)], [1, 2, 2])
+        iterator.close()
+        self.assertEqual(system.snapshot(), ((), (0,), (-1,)))
+
+    def test_open_ended_iteration_stops_at_end_of_data(self):
+        '''Test iteration without time steps stops when inflow data runs out.'''
+        system = self.build()
+        self.assertEqual(len(list(system.iter_simulation())), 5)
+        system.node_by_name('inflow').restore((1,))
+        self.assertEqual(len(list(system.iter_simulation())), 3)
+
+class TestStep(unittest.TestCase):
+    '''Tests step method.'''
+    def test_steps_match_simulation(self):
+        '''Test steps with supplied inflows match a simulation of the same inflows.'''
+        def build(data: list[float]) -> System:
+            return System([[Outlet()],
+                           [[Storage(BasicReservoir(2)), Inflow([1, 0, 1], name='local')]],
+                           [Inflow(data, name='gauge')]])
+        logs = build([1, 2, 0]).simulation(3)
+        system = build([0, 0, 0])
+        steps = [system.step({'gauge': value}) for value in (1, 2, 0)]
+        self.assertEqual([outflow for outflow, _ in steps], logs['outlet'].records)
+        self.assertEqual([storages['storage'] for _, storages in steps],
+                         [record[1] for record in logs['storage'].records[1:]])
+
+    def test_non_inflow_node_raises_value_error(self):
+        '''Test inflows can only be supplied for inflow nodes.'''
+        system = System([[Outlet()], [Storage(BasicReservoir())], [Inflow([1])]])
+        with self.assertRaises(ValueError):
+            system.step({'storage': 1.0})
+
+    def test_ensemble_raises_value_error(self):
+        '''Test ensemble inflows can not be stepped.'''
+        system = System([[Outlet()], [Storage(BasicReservoir())], [Inflow(np.ones((2, 3)))]])
+        with self.assertRaises(ValueError):
+            system.step({})